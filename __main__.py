@@ -0,0 +1,73 @@
+from . import batch
+import argparse
+import sys
+import time
+
+#usage: python -m dbpf <command> [arguments], run python -m dbpf <command> --help for the arguments of each command
+
+def print_result(result):
+    if result['error'] is None:
+        speed = result['input_size'] / result['seconds'] / 1e6 if result['seconds'] > 0 else 0
+        print('{}: {:.2f} MB -> {:.2f} MB in {:.2f}s ({:.1f} MB/s)'.format(result['path'], result['input_size'] / 1e6, result['output_size'] / 1e6, result['seconds'], speed))
+    else:
+        print('{}: failed: {}'.format(result['path'], result['error']), file=sys.stderr)
+
+def print_summary(results, seconds):
+    summary = batch.summarize(results, seconds)
+    speed = summary['input_size'] / seconds / 1e6 if seconds > 0 else 0
+    print('{} files, {} failed, {:.2f} MB -> {:.2f} MB in {:.2f}s ({:.1f} MB/s)'.format(summary['files'], summary['failed'], summary['input_size'] / 1e6, summary['output_size'] / 1e6, seconds, speed))
+    return summary['failed'] == 0
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m dbpf', description='Batch operations on package files and folders.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('compress', help='compress the entries of the packages')
+    command.add_argument('paths', nargs='+', help='package files or folders')
+    command.add_argument('--output', help='folder to write the packages to instead of replacing them')
+    command.add_argument('--level', type=int, help='compression level between 1 and 9, defaults to 5')
+    command.add_argument('--processes', type=int, help='number of processes, defaults to the number of cores')
+    command.add_argument('--journal', help='journal file used to resume an interrupted batch')
+
+    command = commands.add_parser('decompress', help='decompress the entries of the packages')
+    command.add_argument('paths', nargs='+', help='package files or folders')
+    command.add_argument('--output', help='folder to write the packages to instead of replacing them')
+    command.add_argument('--processes', type=int, help='number of processes, defaults to the number of cores')
+    command.add_argument('--journal', help='journal file used to resume an interrupted batch')
+
+    command = commands.add_parser('merge', help='merge the packages into a single package')
+    command.add_argument('output', help='path of the merged package')
+    command.add_argument('paths', nargs='+', help='package files or folders')
+    command.add_argument('--compress', action='store_true', help='compress the entries')
+    command.add_argument('--level', type=int, help='compression level between 1 and 9, defaults to 5')
+    command.add_argument('--workers', type=int, help='number of threads used for compression, defaults to the number of cores')
+
+    command = commands.add_parser('conflicts', help='list the entries found in more than one package')
+    command.add_argument('paths', nargs='+', help='package files or folders')
+    command.add_argument('--cache', default=':memory:', help='scanner database used to avoid reading unchanged files again')
+
+    args = parser.parse_args(args)
+    start = time.perf_counter()
+
+    if args.command == 'compress':
+        results = batch.compress(args.paths, args.output, args.level, args.processes, args.journal, print_result)
+
+    elif args.command == 'decompress':
+        results = batch.decompress(args.paths, args.output, args.processes, args.journal, print_result)
+
+    elif args.command == 'merge':
+        results = batch.merge(args.paths, args.output, args.compress, args.level, args.workers, print_result)
+
+    else:
+        for tgir, paths in batch.conflicts(args.paths, args.cache).items():
+            print('Type: 0x{:08X}, Group: 0x{:08X}, Instance: 0x{:08X}, Resource: 0x{:08X}'.format(*tgir))
+
+            for path in paths:
+                print('    {}'.format(path))
+
+        return 0
+
+    return 0 if print_summary(results, time.perf_counter() - start) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
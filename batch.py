@@ -0,0 +1,175 @@
+from .dbpf import Package, PackageWriter, _map
+from .scan import Scanner
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import time
+
+#operations on many package files, each file is processed by a separate process
+#paths can be package files or folders, folders are searched recursively for package files
+#if output is provided, then the files are written to the output folder keeping their paths relative to the folders that they were found in,
+#otherwise the files are replaced
+#if journal is provided, then the paths of the processed files are appended to the journal file, and the files listed in it are skipped,
+#so an interrupted batch can be resumed by running it again with the same journal, the journal is deleted once every file succeeds
+#report is called with the result of each file as it finishes, results are dictionaries with the keys
+#path, output, input_size, output_size, seconds, and error (None if the file was processed successfully)
+
+def compress(paths, output=None, level=None, processes=None, journal=None, report=None):
+    return _run(_compress_file, paths, output, processes, journal, report, level)
+
+def decompress(paths, output=None, processes=None, journal=None, report=None):
+    return _run(_decompress_file, paths, output, processes, journal, report)
+
+#writes the entries of all the packages into a single package, without holding more than one package in memory at once
+#entries are compressed using workers threads if compress is True
+#the merged package is written in a single process and can't be resumed, the entries of a package that fails are removed from it
+def merge(paths, output, compress=False, level=None, workers=None, report=None):
+    if workers is None:
+        workers = os.cpu_count()
+
+    results = []
+
+    with PackageWriter(output) as writer:
+        for path, relative_path in _find_packages(paths):
+            if path == os.path.abspath(output):
+                continue
+
+            start = time.perf_counter()
+            result = {'path': path, 'output': output, 'input_size': os.path.getsize(path), 'output_size': 0, 'seconds': 0, 'error': None}
+
+            count = len(writer.index)
+
+            try:
+                package = Package.unpack(path, lazy=True)
+
+                if compress:
+                    _map(lambda entry: entry.compress(level, True), package.entries, workers)
+
+                for entry in package.entries:
+                    writer.add_entry(entry)
+
+                result['output_size'] = sum(writer.index.sizes[count:])
+
+            except Exception as e:
+                writer.truncate(count)
+                result['error'] = str(e)
+
+            result['seconds'] = time.perf_counter() - start
+            results.append(result)
+
+            if report is not None:
+                report(result)
+
+    return results
+
+#returns a dictionary mapping each (type, group, instance, resource) found in more than one file to the list of these files
+def conflicts(paths, cache_path=':memory:', workers=8):
+    with Scanner(cache_path) as scanner:
+        scanner.scan(paths, workers)
+        return scanner.conflicts()
+
+#returns the total input size, output size, and time of the successful results, and the number of failures
+def summarize(results, seconds):
+    succeeded = [result for result in results if result['error'] is None]
+
+    return {
+        'files': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'input_size': sum(result['input_size'] for result in succeeded),
+        'output_size': sum(result['output_size'] for result in succeeded),
+        'seconds': seconds,
+    }
+
+def _run(function, paths, output, processes, journal, report, *args):
+    files = _find_packages(paths)
+    done = set()
+
+    if journal is not None and os.path.isfile(journal):
+        with open(journal, encoding='utf-8') as file:
+            done = {line.rstrip('\n') for line in file}
+
+    results = []
+    journal_file = None if journal is None else open(journal, 'a', encoding='utf-8')
+
+    try:
+        with ProcessPoolExecutor(processes) as executor:
+            futures = []
+
+            for path, relative_path in files:
+                if path in done:
+                    continue
+
+                if output is None:
+                    output_path = path
+                else:
+                    output_path = os.path.join(output, relative_path)
+
+                futures.append(executor.submit(function, path, output_path, *args))
+
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+
+                if journal_file is not None and result['error'] is None:
+                    journal_file.write(result['path'] + '\n')
+                    journal_file.flush()
+
+                if report is not None:
+                    report(result)
+    finally:
+        if journal_file is not None:
+            journal_file.close()
+
+    if journal is not None and all(result['error'] is None for result in results):
+        os.remove(journal)
+
+    return results
+
+def _process_file(path, output_path, operation):
+    start = time.perf_counter()
+    result = {'path': path, 'output': output_path, 'input_size': 0, 'output_size': 0, 'seconds': 0, 'error': None}
+
+    try:
+        result['input_size'] = os.path.getsize(path)
+
+        with open(path, 'rb') as file:
+            if file.read(4) != b'DBPF' or len(file.read(92)) < 92:
+                raise ValueError('not a package file')
+
+        if os.path.dirname(output_path) != '':
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        operation()
+        result['output_size'] = os.path.getsize(output_path)
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def _compress_file(path, output_path, level):
+    return _process_file(path, output_path, lambda: Package.unpack(path, lazy=True).pack_into(output_path, compress=True, level=level))
+
+def _decompress_file(path, output_path):
+    return _process_file(path, output_path, lambda: Package.unpack(path, decompress=True).pack_into(output_path))
+
+#returns a list of (path, path relative to the folder that it was found in) for each package file, sorted by path
+def _find_packages(paths):
+    if isinstance(paths, str):
+        paths = [paths]
+
+    files = []
+
+    for path in paths:
+        path = os.path.abspath(path)
+
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                for name in names:
+                    if name.lower().endswith('.package'):
+                        file_path = os.path.join(root, name)
+                        files.append((file_path, os.path.relpath(file_path, path)))
+        else:
+            files.append((path, os.path.basename(path)))
+
+    return sorted(files)
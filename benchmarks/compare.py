@@ -0,0 +1,27 @@
+import json
+import sys
+
+#usage: python -m dbpf.benchmarks.compare old.json new.json
+#prints the speedup of each benchmark found in both results files
+def main(old_path, new_path):
+    with open(old_path) as file:
+        old = json.load(file)
+
+    with open(new_path) as file:
+        new = json.load(file)
+
+    old_results = {_key(result): result['seconds'] for result in old['results']}
+
+    print('{:<20} {:<60} {:>10} {:>10} {:>8}'.format('benchmark', 'params', 'old (s)', 'new (s)', 'speedup'))
+
+    for result in new['results']:
+        key = _key(result)
+        if key in old_results:
+            params = ', '.join('{}={}'.format(name, value) for name, value in sorted(result['params'].items()))
+            print('{:<20} {:<60} {:>10.4f} {:>10.4f} {:>7.2f}x'.format(result['benchmark'], params, old_results[key], result['seconds'], old_results[key] / result['seconds']))
+
+def _key(result):
+    return (result['benchmark'], json.dumps(result['params'], sort_keys=True))
+
+if __name__ == '__main__':
+    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,59 @@
+from ..dbpf import Entry, Package
+import random
+
+#types used by the generated entries, with a name in the format read by Entry.read_name
+#BHAV (named type), GMDC (RCOL type), and GZPS (CPF type)
+_types = [0x42484156, 0xAC4F8687, 0xEBCF3E27]
+
+#generates a package of entries with random sizes around entry_size
+#compressibility is the fraction of each entry built from a small vocabulary of random words, the rest is random bytes
+#resources are only used if index_minor_version is 2
+def make_package(entry_count, entry_size, compressibility=1.0, index_minor_version=2, seed=0):
+    rng = random.Random(seed)
+    words = [rng.randbytes(8) for i in range(256)]
+
+    package = Package()
+    package.header.index_minor_version = index_minor_version
+
+    for i in range(entry_count):
+        type_id = _types[i % len(_types)]
+        size = rng.randint(entry_size // 2, entry_size * 3 // 2)
+
+        if index_minor_version == 2:
+            resource_id = rng.randint(0, 1)
+        else:
+            resource_id = 0
+
+        entry = Entry(type_id, 0x7FD46CD0, i, resource_id)
+        _write_name(entry, 'entry_{}'.format(i))
+
+        while len(entry) < size:
+            if rng.random() < compressibility:
+                entry.write(rng.choice(words))
+            else:
+                entry.write(rng.randbytes(8))
+
+        entry.seek(0)
+        package.entries.append(entry)
+
+    return package
+
+def _write_name(entry, name):
+    if entry.type == 0x42484156:
+        entry.write(name.encode('utf-8').ljust(64, b'\x00'))
+
+    elif entry.type == 0xAC4F8687:
+        entry.write(b'\x0bcSGResource')
+        entry.write(b'\x00' * 8)
+        entry.write_7bint(len(name))
+        entry.write_str(name)
+
+    else:
+        entry.write(b'\x18\xea\x8b\x0b\x04\x00\x00\x00name')
+        entry.write_pstr(name, 4)
+
+#writes a package generated by make_package to path, compress also adds a CLST
+def write_package(path, entry_count, entry_size, compressibility=1.0, index_minor_version=2, compress=False, seed=0):
+    package = make_package(entry_count, entry_size, compressibility, index_minor_version, seed)
+    package.pack_into(path, compress=compress)
+    return package
@@ -0,0 +1,52 @@
+from .. import _qfs
+from ..dbpf import Package
+from .corpus import make_package
+import sys
+import time
+
+#usage: python -m dbpf.benchmarks.decompress [package paths...]
+#measures the decompression throughput, uses synthetic packages if no paths are provided
+def main(paths, qfs=_qfs, repeat=5):
+    if len(paths) > 0:
+        sets = [(path, Package.unpack(path).entries) for path in paths]
+    else:
+        sets = [('compressibility {}'.format(compressibility), make_package(2000, 8192, compressibility).entries) for compressibility in (0.5, 0.9, 1.0)]
+
+    print('{:<30} {:>12} {:>18}'.format('', 'decompress', 'decompress_into'))
+
+    for name, entries in sets:
+        contents = []
+        for entry in entries:
+            if entry.type == 0xE86B1EEF:
+                continue
+
+            if entry.compressed:
+                contents.append((entry.buffer, entry._read_uncompressed_size()))
+            else:
+                compressed = qfs.compress(entry.buffer, len(entry) * 2)
+                if compressed is not None:
+                    contents.append((compressed, len(entry)))
+
+        total_size = sum(size for content, size in contents)
+        buffer = bytearray(max(size for content, size in contents))
+
+        decompress_time = _best(lambda: [qfs.decompress(content, size) for content, size in contents], repeat)
+        decompress_into_time = _best(lambda: [qfs.decompress_into(content, buffer, size) for content, size in contents], repeat)
+
+        print('{:<30} {:>7.1f} MB/s {:>13.1f} MB/s'.format(name, total_size / decompress_time / 1e6, total_size / decompress_into_time / 1e6))
+
+def _best(function, repeat):
+    best = None
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,56 @@
+from ..dbpf import Entry, Package
+import os
+import sys
+import sysconfig
+import time
+
+#usage: python -m dbpf.benchmarks.levels [package paths...]
+#uses entries cut from the sources of the python standard library if no paths are provided,
+#text compresses differently at each level unlike the synthetic packages, so it shows the trade-off between the levels
+def main(paths):
+    if len(paths) > 0:
+        contents = []
+        for path in paths:
+            contents.extend(entry.buffer for entry in Package.unpack(path, decompress=True).entries if entry.type != 0xE86B1EEF)
+    else:
+        contents = text_contents(2000, 8192)
+
+    total_size = sum(len(content) for content in contents)
+
+    print('{} entries, {:.1f} MB'.format(len(contents), total_size / 1e6))
+    print('{:>6} {:>10} {:>8}'.format('level', 'MB/s', 'ratio'))
+
+    for level in range(1, 10):
+        entries = [Entry(0, 0, i, content=content) for i, content in enumerate(contents)]
+
+        start = time.perf_counter()
+        for entry in entries:
+            entry.compress(level)
+        elapsed = time.perf_counter() - start
+
+        compressed_size = sum(len(entry) for entry in entries)
+        print('{:>6} {:>10.1f} {:>8.3f}'.format(level, total_size / elapsed / 1e6, compressed_size / total_size))
+
+#returns up to count entries of entry_size bytes cut from the python files of the standard library, in sorted order
+def text_contents(count, entry_size):
+    stdlib = sysconfig.get_paths()['stdlib']
+    contents = []
+
+    for root, dirs, names in os.walk(stdlib):
+        dirs[:] = sorted(name for name in dirs if name not in ('site-packages', 'dist-packages')) #only the standard library itself
+
+        for name in sorted(names):
+            if name.endswith('.py'):
+                with open(os.path.join(root, name), 'rb') as file:
+                    data = file.read()
+
+                for i in range(0, len(data) - entry_size + 1, entry_size):
+                    contents.append(data[i:i + entry_size])
+
+                    if len(contents) == count:
+                        return contents
+
+    return contents
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,40 @@
+from ..dbpf import Package
+from .corpus import make_package
+import os
+import sys
+import tempfile
+import time
+
+#usage: python -m dbpf.benchmarks.parallel [entry_count] [entry_size]
+def main(entry_count=5000, entry_size=4096):
+    worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+
+    with tempfile.TemporaryDirectory() as directory:
+        serial_path = os.path.join(directory, 'serial.package')
+        make_package(entry_count, entry_size).pack_into(serial_path, compress=True)
+
+        with open(serial_path, 'rb') as file:
+            expected = file.read()
+
+        print('{} entries of {} bytes, {} cores'.format(entry_count, entry_size, os.cpu_count()))
+        print('{:>8} {:>12} {:>12} {:>10}'.format('workers', 'pack (s)', 'unpack (s)', 'identical'))
+
+        for workers in worker_counts:
+            path = os.path.join(directory, '{}.package'.format(workers))
+            package = make_package(entry_count, entry_size)
+
+            start = time.perf_counter()
+            package.pack_into(path, compress=True, workers=workers)
+            pack_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            Package.unpack(path, decompress=True, workers=workers)
+            unpack_time = time.perf_counter() - start
+
+            with open(path, 'rb') as file:
+                identical = file.read() == expected
+
+            print('{:>8} {:>12.3f} {:>12.3f} {:>10}'.format(workers, pack_time, unpack_time, str(identical)))
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
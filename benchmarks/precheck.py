@@ -0,0 +1,37 @@
+from ..dbpf import Entry, Package
+from .corpus import make_package
+import sys
+import time
+
+#usage: python -m dbpf.benchmarks.precheck [package paths...]
+#compares compressing the entries with and without the compression pre-check
+#uses a synthetic package of compressible and incompressible entries if no paths are provided
+def main(paths):
+    if len(paths) > 0:
+        entries = []
+        for path in paths:
+            entries.extend(Package.unpack(path, decompress=True).entries)
+    else:
+        entries = make_package(1000, 16384, 0.9).entries + make_package(1000, 16384, 0.0, seed=1).entries
+
+    entries = [entry for entry in entries if entry.type != 0xE86B1EEF]
+    total_size = sum(len(entry) for entry in entries)
+
+    print('{} entries, {:.1f} MB'.format(len(entries), total_size / 1e6))
+    print('{:>10} {:>10} {:>8} {:>10} {:>10}'.format('precheck', 'seconds', 'ratio', 'compressed', 'skipped'))
+
+    for precheck in (False, True):
+        copies = [Entry(entry.type, entry.group, entry.instance, entry.resource, content=entry.buffer) for entry in entries]
+
+        start = time.perf_counter()
+        for entry in copies:
+            entry.compress(precheck=precheck)
+        elapsed = time.perf_counter() - start
+
+        compressed_size = sum(len(entry) for entry in copies)
+        compressed_count = sum(entry.compressed for entry in copies)
+        skipped = sum(not entry.compressible() for entry in copies if not entry.compressed) if precheck else 0
+        print('{:>10} {:>10.3f} {:>8.3f} {:>10} {:>10}'.format(str(precheck), elapsed, compressed_size / total_size, compressed_count, skipped))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
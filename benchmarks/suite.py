@@ -0,0 +1,130 @@
+from .. import dbpf
+from .. import _qfs
+from .corpus import make_package, write_package
+import argparse
+import datetime
+import json
+import os
+import platform
+import tempfile
+import time
+
+#usage: python -m dbpf.benchmarks.suite [--output results.json] [--repeat 3] [--quick]
+#compare two runs with: python -m dbpf.benchmarks.compare old.json new.json
+
+def timeit(function, repeat):
+    best = None
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+def configurations(quick):
+    if quick:
+        entry_counts = [1000]
+        entry_sizes = [4096]
+    else:
+        entry_counts = [1000, 10000]
+        entry_sizes = [1024, 16384]
+
+    for entry_count in entry_counts:
+        for entry_size in entry_sizes:
+            for compressibility in (0.0, 0.9):
+                for index_minor_version in (1, 2):
+                    for clst in (False, True):
+                        yield {'entry_count': entry_count, 'entry_size': entry_size, 'compressibility': compressibility, 'index_minor_version': index_minor_version, 'clst': clst}
+
+def run_package_benchmarks(directory, params, repeat, results):
+    path = os.path.join(directory, 'input.package')
+    output_path = os.path.join(directory, 'output.package')
+
+    package = write_package(path, params['entry_count'], params['entry_size'], params['compressibility'], params['index_minor_version'], params['clst'])
+    file_size = os.path.getsize(path)
+
+    benchmarks = {
+        'unpack': lambda: dbpf.Package.unpack(path),
+        'unpack_lazy': lambda: dbpf.Package.unpack(path, lazy=True),
+        'unpack_decompress': lambda: dbpf.Package.unpack(path, decompress=True),
+        'unpack_read_names': lambda: dbpf.Package.unpack(path, read_names=True),
+        'pack_into': lambda: dbpf.Package.unpack(path, decompress=True).pack_into(output_path),
+    }
+
+    #the entries are copied so that compress doesn't reuse the content from before they were decompressed
+    if params['clst']:
+        uncompressed = dbpf.Package.unpack(path, decompress=True)
+        benchmarks['pack_into_compress'] = lambda: _fresh_copy(uncompressed).pack_into(output_path, compress=True)
+
+    for name, function in benchmarks.items():
+        seconds = timeit(function, repeat)
+        results.append({'benchmark': name, 'params': params, 'seconds': seconds, 'mb_per_s': file_size / seconds / 1e6})
+
+    #search every instance with the indexes and with a linear scan
+    entries = list(package.entries)
+    instances = [entry.instance for entry in entries]
+
+    seconds = timeit(lambda: [dbpf.search(package, instance_id=instance) for instance in instances], repeat)
+    results.append({'benchmark': 'search_indexed', 'params': params, 'seconds': seconds})
+
+    if params['entry_count'] <= 1000:
+        seconds = timeit(lambda: [dbpf.search(entries, instance_id=instance) for instance in instances], repeat)
+        results.append({'benchmark': 'search_linear', 'params': params, 'seconds': seconds})
+
+def _fresh_copy(package):
+    copy = dbpf.Package()
+    copy.header = package.header.copy()
+    copy.entries = [dbpf.Entry(entry.type, entry.group, entry.instance, entry.resource, content=entry.buffer) for entry in package.entries if entry.type != 0xE86B1EEF]
+    return copy
+
+def run_qfs_benchmarks(params, repeat, results):
+    contents = [entry.buffer for entry in make_package(params['entry_count'], params['entry_size'], params['compressibility']).entries]
+    total_size = sum(len(content) for content in contents)
+
+    for level in (1, 5, 9):
+        compressed = []
+        seconds = timeit(lambda: compressed.__setitem__(slice(None), [_qfs.compress(content, len(content) * 2, level) for content in contents]), repeat)
+        ratio = sum(len(content) for content in compressed) / total_size
+        results.append({'benchmark': 'qfs_compress', 'params': dict(params, level=level), 'seconds': seconds, 'mb_per_s': total_size / seconds / 1e6, 'ratio': ratio})
+
+    seconds = timeit(lambda: [_qfs.decompress(content, len(original)) for content, original in zip(compressed, contents)], repeat)
+    results.append({'benchmark': 'qfs_decompress', 'params': params, 'seconds': seconds, 'mb_per_s': total_size / seconds / 1e6})
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the dbpf benchmarks on synthetic packages.')
+    parser.add_argument('--output', default='benchmark_results.json', help='path of the JSON file to write the results to')
+    parser.add_argument('--repeat', type=int, default=3, help='number of times to run each benchmark, the best time is kept')
+    parser.add_argument('--quick', action='store_true', help='only run the smallest configurations')
+    args = parser.parse_args()
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for params in configurations(args.quick):
+            print('running {}'.format(params))
+            run_package_benchmarks(directory, params, args.repeat, results)
+
+            if params['index_minor_version'] == 2 and not params['clst']:
+                run_qfs_benchmarks({key: params[key] for key in ('entry_count', 'entry_size', 'compressibility')}, args.repeat, results)
+
+    output = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=2)
+
+    print('results written to {}'.format(args.output))
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
-g++ -c -fPIC -O2 qfs.cpp
-g++ -shared qfs.o -o qfs.dll
-del qfs.o
+for /f "delims=" %%i in ('python -c "import sysconfig; print(sysconfig.get_paths()['include'])"') do set PY_INCLUDE=%%i
+for /f "delims=" %%i in ('python -c "import os, sys; print(os.path.join(sys.base_prefix, 'libs'))"') do set PY_LIBS=%%i
+for /f "delims=" %%i in ('python -c "import sys; print('python{}{}'.format(*sys.version_info[:2]))"') do set PY_LIB=%%i
+for /f "delims=" %%i in ('python -c "import sysconfig; print(sysconfig.get_config_var('EXT_SUFFIX'))"') do set PY_SUFFIX=%%i
+g++ -shared -O2 -DMS_WIN64 -I"%PY_INCLUDE%" qfs.cpp qfsmodule.cpp -L"%PY_LIBS%" -l%PY_LIB% -o _qfs%PY_SUFFIX%
 pause
\ No newline at end of file
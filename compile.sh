@@ -0,0 +1,8 @@
+#!/bin/sh
+cd "$(dirname "$0")"
+
+PYTHON=${PYTHON:-python3}
+PY_INCLUDE=$($PYTHON -c "import sysconfig; print(sysconfig.get_paths()['include'])")
+PY_SUFFIX=$($PYTHON -c "import sysconfig; print(sysconfig.get_config_var('EXT_SUFFIX'))")
+
+g++ -shared -fPIC -O2 -I"$PY_INCLUDE" qfs.cpp qfsmodule.cpp -o _qfs$PY_SUFFIX
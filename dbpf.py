@@ -1,28 +1,171 @@
-from .structio import StructIO
-import ctypes
+from .structio import StructIO, StructView
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+import asyncio
+import mmap
 import os
 import sys
+import threading
+import time
+import weakref
 
-if sys.platform != 'win32':
-    raise Exception('The dbpf library currently only works in Windows')
-
-if sys.maxsize <= 2 ** 32:
-    raise Exception('Requires a 64 bit system')
+try:
+    from . import _qfs
+except ImportError:
+    raise Exception('The QFS extension is missing, compile it by running compile.bat (Windows) or compile.sh (Linux)') from None
 
 named_types = {0x42434F4E, 0x42484156, 0x4E524546, 0x4F424A44, 0x53545223, 0x54544142, 0x54544173, 0x424D505F, 0x44475250, 0x534C4F54, 0x53505232}
 named_rcol_types = {0xFB00791E, 0x4D51F042, 0xE519C933, 0xAC4F8687, 0x7BA3838C, 0xC9C81B9B, 0xC9C81BA3, 0xC9C81BA9, 0xC9C81BAD, 0xED534136, 0xFC6EB1F7, 0x49596978, 0x1C4A276C}
 named_cpf_types = {0x2C1FD8A1, 0x0C1FE246, 0xEBCF3E27}
 lua_types = {0x9012468A, 0x9012468B}
 
+#used by the compression pre-check to skip entries that are unlikely to get smaller
+incompressible_types = {0x2026960B, 0x856DDBAC, 0x8C3CE95A} #audio, PNG/TGA images, and JPEG images
+min_compress_size = 64
+sample_size = 2048
+
 class CompressionError(Exception): pass
 
-qfs = ctypes.CDLL(os.path.join(os.path.dirname(__file__), 'qfs.dll'))
+#collects timings and sizes from Package.unpack and Package.pack_into when passed as their stats argument
+#if callback is provided, then it's called with each record as it's added, possibly from worker threads
+class Stats:
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.phases = {} #phase name -> seconds
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.entries = [] #one record for each entry compressed or decompressed
+        self.skipped = 0 #entries left uncompressed because compression did not make them smaller
+        self.prechecked = 0 #entries not compressed because they failed the compression pre-check
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        lines = ['{}: {:.3f}s'.format(name, seconds) for name, seconds in self.phases.items()]
+        lines.append('bytes read: {}, bytes written: {}'.format(self.bytes_read, self.bytes_written))
+
+        for operation in ('compress', 'decompress'):
+            records = [record for record in self.entries if record['operation'] == operation]
+
+            if len(records) > 0:
+                size = sum(record['size'] for record in records)
+                result_size = sum(record['result_size'] for record in records)
+                seconds = sum(record['seconds'] for record in records)
+                lines.append('{}: {} entries, {:.3f}s, {} -> {} bytes'.format(operation, len(records), seconds, size, result_size))
+
+        lines.append('skipped: {}, skipped by pre-check: {}'.format(self.skipped, self.prechecked))
+        return '\n'.join(lines)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0) + seconds
+            self._emit({'event': 'phase', 'name': name, 'seconds': seconds})
+
+    #operation is 'compress', 'decompress', or 'reuse' when compress restored the original compressed content
+    def add_entry(self, operation, entry, seconds, size, result_size):
+        record = {
+            'event': 'entry',
+            'operation': operation,
+            'type': entry.type,
+            'group': entry.group,
+            'instance': entry.instance,
+            'resource': entry.resource,
+            'seconds': seconds,
+            'size': size,
+            'result_size': result_size,
+            'ratio': result_size / size if size > 0 else 1.0,
+        }
+
+        with self._lock:
+            self.entries.append(record)
+
+        self._emit(record)
+
+    #precheck is True if the entry failed the compression pre-check, otherwise compression did not make it smaller
+    def add_skipped(self, entry, precheck=False):
+        with self._lock:
+            if precheck:
+                self.prechecked += 1
+            else:
+                self.skipped += 1
+
+        self._emit({'event': 'skipped', 'precheck': precheck, 'type': entry.type, 'group': entry.group, 'instance': entry.instance, 'resource': entry.resource, 'size': len(entry)})
+
+    def _emit(self, record):
+        if self.callback is not None:
+            self.callback(record)
+
+#LRU cache of decompressed content bounded by max_size bytes
+#entries are keyed by the identity of the package file that they were read from and their location in it
+#enable it for the whole process with set_cache, it's then used by Entry.decompress
+class DecompressionCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._contents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._contents)
+
+    def __str__(self):
+        return 'entries: {}, size: {}/{}, hits: {}, misses: {}'.format(len(self), self.size, self.max_size, self.hits, self.misses)
+
+    def get(self, key):
+        with self._lock:
+            content = self._contents.get(key)
+
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._contents.move_to_end(key)
+
+            return content
+
+    def put(self, key, content):
+        if len(content) > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._contents:
+                self._contents.move_to_end(key)
+                return
+
+            self._contents[key] = content
+            self.size += len(content)
 
-qfs.qfs_compress.argtypes = [ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
-qfs.qfs_compress.restype = ctypes.c_int
+            while self.size > self.max_size:
+                key, content = self._contents.popitem(last=False)
+                self.size -= len(content)
 
-qfs.qfs_decompress.argtypes = [ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
-qfs.qfs_decompress.restype = ctypes.c_bool
+    def clear(self):
+        with self._lock:
+            self._contents.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+_cache = None
+
+#sets the process-wide decompression cache, None disables it, returns the previous cache
+def set_cache(cache):
+    global _cache
+    previous = _cache
+    _cache = cache
+    return previous
+
+def get_cache():
+    return _cache
 
 class Header:
     def __init__(self):
@@ -73,14 +216,190 @@ class Header:
 class Entry(StructIO):
     def __init__(self, type_id, group_id, instance_id, resource_id=0, location=None, size=None, name='', content=b'', compressed=False):
         super().__init__(content)
-        self.type = type_id
-        self.group = group_id
-        self.instance = instance_id
-        self.resource = resource_id
-        self.name = name
+        self._lists = []
+        #a new entry is not in any entry list yet, so the indexed attributes are set directly
+        self._type = type_id
+        self._group = group_id
+        self._instance = instance_id
+        self._resource = resource_id
+        self._name = name
         self.compressed = compressed
         self._location = location
         self._size = size
+        self._source = None
+        self._view = None
+        self._original = None
+        self._file = None #identity of the package file that the entry is stored in, used by the decompression cache and incremental saves
+        self._file_compressed = False #whether the entry is compressed in that file
+
+    #changing an indexed attribute moves the entry in the indexes of the entry lists containing it
+    def _set_indexed(self, attribute, value):
+        if len(self._lists) == 0:
+            setattr(self, attribute, value)
+            return
+
+        lists = []
+        for ref in self._lists:
+            entries = ref()
+            if entries is not None and entries._discard(self):
+                lists.append(entries)
+
+        setattr(self, attribute, value)
+
+        for entries in lists:
+            entries._add(self)
+
+    def _add_list(self, entries):
+        self._lists = [ref for ref in self._lists if ref() is not None and ref() is not entries]
+        self._lists.append(weakref.ref(entries))
+
+    type = property(lambda self: self._type, lambda self, value: self._set_indexed('_type', value))
+    group = property(lambda self: self._group, lambda self, value: self._set_indexed('_group', value))
+    instance = property(lambda self: self._instance, lambda self, value: self._set_indexed('_instance', value))
+    resource = property(lambda self: self._resource, lambda self, value: self._set_indexed('_resource', value))
+    name = property(lambda self: self._name, lambda self, value: self._set_indexed('_name', value))
+
+    def __len__(self):
+        if self._source is not None:
+            return self._size
+
+        return super().__len__()
+
+    @StructIO.buffer.setter
+    def buffer(self, b):
+        self._modified()
+        self._set_content(b)
+
+    #the content no longer matches the content that was read from the file
+    def _modified(self):
+        self._original = None
+        self._file = None
+
+    #replaces the content without marking it as modified
+    def _set_content(self, b):
+        self._source = None
+        self._view = None
+        StructIO.buffer.fset(self, b)
+
+    #lazy entries are backed by a memory map of the package file
+    #they are read through a read-only view of the memory map until they are modified
+    def _get_view(self):
+        if self._view is None:
+            self._view = StructView(self._source, self._location, self._location + self._size, self.endian, self.encoding, self.errors)
+
+        return self._view
+
+    def _load(self):
+        if self._source is not None:
+            if self._view is None:
+                position = 0
+            else:
+                position = self._view.tell()
+
+            self._set_content(self._source[self._location:self._location + self._size])
+            self.seek(position)
+
+    def getvalue(self):
+        self._load()
+        return super().getvalue()
+
+    def getbuffer(self):
+        self._load()
+        self._modified() #the returned view can be used to modify the content
+        return super().getbuffer()
+
+    def read(self, size=-1):
+        if self._source is not None:
+            return self._get_view().read(size)
+
+        return super().read(size)
+
+    def read1(self, size=-1):
+        if self._source is not None:
+            return self._get_view().read1(size)
+
+        return super().read1(size)
+
+    def readinto(self, b):
+        if self._source is not None:
+            return self._get_view().readinto(b)
+
+        return super().readinto(b)
+
+    def readline(self, size=-1):
+        if self._source is not None:
+            return self._get_view().readline(size)
+
+        return super().readline(size)
+
+    def readlines(self, hint=-1):
+        if self._source is not None:
+            return self._get_view().readlines(hint)
+
+        return super().readlines(hint)
+
+    def __next__(self):
+        if self._source is not None:
+            return self._get_view().__next__()
+
+        return super().__next__()
+
+    def write(self, b):
+        self._load()
+        self._modified()
+        return super().write(b)
+
+    def writelines(self, lines):
+        self._load()
+        self._modified()
+        return super().writelines(lines)
+
+    def seek(self, pos, whence=0):
+        if self._source is not None:
+            return self._get_view().seek(pos, whence)
+
+        return super().seek(pos, whence)
+
+    def tell(self):
+        if self._source is not None:
+            return self._get_view().tell()
+
+        return super().tell()
+
+    def find(self, b):
+        if self._source is not None:
+            return self._get_view().find(b)
+
+        return super().find(b)
+
+    def index(self, b):
+        if self._source is not None:
+            return self._get_view().index(b)
+
+        return super().index(b)
+
+    def truncate(self, size=None):
+        self._load()
+        self._modified()
+        return super().truncate(size)
+
+    #returns the content without loading lazy entries
+    def _content(self):
+        if self._source is not None:
+            return memoryview(self._source)[self._location:self._location + self._size]
+
+        return self.getvalue()
+
+    def _read_uncompressed_size(self):
+        #uncompressed size is written in big endian
+        if self._source is not None:
+            return int.from_bytes(self._source[self._location + 6:self._location + 9], 'big')
+
+        position = self.tell()
+        self.seek(6)
+        uncompressed_size = self.read_int(3, 'big')
+        self.seek(position)
+        return uncompressed_size
 
     def __str__(self):
         if self.name == '':
@@ -90,72 +409,172 @@ class Entry(StructIO):
 
         return string + 'Type: 0x{:08X}, Group: 0x{:08X}, Instance: 0x{:08X}, Resource: 0x{:08X}'.format(self.type, self.group, self.instance, self.resource)
 
+    #the copy shares the content with the entry until one of them is modified
+    #copies of lazy entries share the memory map, and are only loaded when they are modified
     def copy(self):
-        return Entry(self.type, self.group, self.instance, self.resource, name=self.name, content=self.buffer, compressed=self.compressed)
+        if self._source is None:
+            content = self.getvalue() #BytesIO shares the bytes object until it's written to
+        else:
+            content = b''
+
+        entry = Entry(self.type, self.group, self.instance, self.resource, self._location, self._size, self.name, content, self.compressed)
+        entry._source = self._source
+        entry._original = self._original
+        entry._file = self._file
+        entry._file_compressed = self._file_compressed
+        return entry
 
     #using C++ library from moreawesomethanyou
-    def compress(self):
+    def compress(self, level=None, precheck=False):
         if not self.compressed and self.type != 0xE86B1EEF:
-            src = self.buffer
-            src_len = len(src)
-            dst_len = src_len - 1 #should be smaller, otherwise keep it uncompressed
-            dst = (ctypes.c_char * dst_len)()
+            #reuse the compressed content from before the entry was decompressed if it wasn't modified since,
+            #unless a level is requested
+            if level is None and self._original is not None:
+                self._set_content(self._original)
+                self._original = None
+                self.compressed = True
+                return self
+
+            if level is None:
+                level = 5
 
-            dst_len = qfs.qfs_compress(src, src_len, dst, dst_len)
+            if precheck and not self.compressible():
+                return self
 
-            if dst_len:
-                self.buffer = dst[:dst_len]
+            src = self._content()
+            dst = _qfs.compress(src, len(src) - 1, level) #should be smaller, otherwise keep it uncompressed
+
+            if dst is not None:
+                self._set_content(dst)
                 self.compressed = True
 
         return self
 
+    #cheap test of whether compressing the entry is worth trying
+    #fails for the types in incompressible_types, entries smaller than min_compress_size,
+    #and large entries where a sample from the middle does not get smaller with the fastest compression level
+    def compressible(self):
+        if self.type in incompressible_types:
+            return False
+
+        size = len(self)
+
+        if size < min_compress_size:
+            return False
+
+        #smaller entries are cheap enough to just try compressing
+        if size < 2 * sample_size:
+            return True
+
+        start = (size - sample_size) // 2
+        sample = self._content()[start:start + sample_size]
+        return _qfs.compress(sample, sample_size * 31 // 32, 1) is not None
+
     #using C++ library from moreawesomethanyou
     def decompress(self):
         if self.compressed:
-            src = self.buffer
-            src_len = len(src)
+            src = self._content()
+            cache = _cache
 
-            self.seek(6)
-            dst_len = self.read_int(3, 'big')
-            self.seek(0)
+            if cache is not None and self._file is not None:
+                key = (self._file, self._location)
+                dst = cache.get(key)
 
-            dst = (ctypes.c_char * dst_len)()
-            success = qfs.qfs_decompress(src, src_len, dst, dst_len)
+                if dst is None:
+                    dst = _qfs.decompress(src, self._read_uncompressed_size())
 
-            if success:
-                self.buffer = dst
+                    if dst is not None:
+                        cache.put(key, dst)
+            else:
+                dst = _qfs.decompress(src, self._read_uncompressed_size())
+
+            if dst is not None:
+                self._set_content(dst)
+                self._original = bytes(src) #copies the content if it's a view of a memory map
                 self.compressed = False
             else:
                 raise CompressionError('Could not decompress the file')
 
         return self
 
+    #decompresses the content into the writable buffer b without changing the entry, returns the size of the decompressed content
+    #b can be reused for many entries to avoid allocating the output of each one
+    def decompress_into(self, b):
+        content = self._content()
+
+        if not self.compressed:
+            memoryview(b)[:len(content)] = content
+            return len(content)
+
+        size = self._read_uncompressed_size()
+
+        if _qfs.decompress_into(content, b, size) is None:
+            raise CompressionError('Could not decompress the file')
+
+        return size
+
+    #returns the first size bytes of the decompressed content without decompressing the entry
+    def peek(self, size):
+        content = self._content()
+
+        if not self.compressed:
+            return bytes(content[:size])
+
+        uncompressed_size = self._read_uncompressed_size()
+
+        if size >= uncompressed_size:
+            dst = _qfs.decompress(content, uncompressed_size)
+        else:
+            dst = _qfs.decompress(content, size, True) #stops decoding once size bytes are written
+
+        if dst is None:
+            raise CompressionError('Could not decompress the file')
+
+        return dst
+
+    #reads a string preceded by its length, found at offset bytes after the marker (or from the start if marker is None)
+    #decompresses larger parts of the content until the whole string is found
+    def _peek_name(self, marker, offset, read_length):
+        size = 1024
+
+        while True:
+            content = self.peek(size)
+            complete = len(content) < size
+            stream = StructIO(content)
+
+            if marker is None:
+                location = 0
+            else:
+                location = stream.find(marker)
+
+            if location != -1 and (location + offset + 5 <= len(content) or complete):
+                stream.seek(location + offset)
+                length = read_length(stream)
+
+                if stream.tell() + length <= len(content) or complete:
+                    return stream.read_str(length)
+
+                size = max(size * 4, stream.tell() + length)
+
+            elif complete:
+                return ''
+
+            else:
+                size *= 4
+
     def read_name(self):
         try:
             if self.type in named_types:
-                self.decompress()
-                self.name = self.read(64).rstrip(b'x\00').decode('utf-8', errors='ignore')
+                self.name = self.peek(64).rstrip(b'x\00').decode('utf-8', errors='ignore')
 
             elif self.type in named_rcol_types:
-                self.decompress()
-                location = self.find(b'\x0bcSGResource')
-
-                if location != -1:
-                    self.seek(location + 20)
-                    self.name = self.read_str(self.read_7bint())
+                self.name = self._peek_name(b'\x0bcSGResource', 20, StructIO.read_7bint)
 
             elif self.type in named_cpf_types:
-                self.decompress()
-                location = self.find(b'\x18\xea\x8b\x0b\x04\x00\x00\x00name')
-
-                if location != -1:
-                    self.seek(location + 12)
-                    self.name = self.read_pstr(4)
+                self.name = self._peek_name(b'\x18\xea\x8b\x0b\x04\x00\x00\x00name', 12, lambda stream: stream.read_int(4))
 
             elif self.type in lua_types:
-                self.decompress()
-                self.seek(4)
-                self.name = self.read_pstr(4)
+                self.name = self._peek_name(None, 4, lambda stream: stream.read_int(4))
 
             else:
                 self.name = ''
@@ -163,14 +582,346 @@ class Entry(StructIO):
         except:
             self.name = ''
 
-        self.seek(0)
         return self.name
 
+#key functions of the indexes kept by EntryList
+_index_keys = {
+    'tgir': lambda entry: (entry.type, entry.group, entry.instance, entry.resource),
+    'tgi': lambda entry: (entry.type, entry.group, entry.instance),
+    'tg': lambda entry: (entry.type, entry.group),
+    't': lambda entry: entry.type,
+    'i': lambda entry: entry.instance,
+    'name': lambda entry: entry.name.lower(),
+}
+
+#a list of entries with hash indexes for searching
+#each index is built the first time it's needed, kept up to date when entries are appended or their attributes change, and dropped when the list is modified in any other way
+class EntryList(list):
+    def __init__(self, entries=()):
+        super().__init__(entries)
+        self._indexes = {}
+
+    def _get_index(self, kind):
+        if kind not in self._indexes:
+            key = _index_keys[kind]
+            index = {}
+
+            for entry in self:
+                index.setdefault(key(entry), {})[id(entry)] = entry
+                entry._add_list(self)
+
+            self._indexes[kind] = index
+
+        return self._indexes[kind]
+
+    def _add(self, entry):
+        for kind, index in self._indexes.items():
+            index.setdefault(_index_keys[kind](entry), {})[id(entry)] = entry
+
+    #returns False if the entry is not indexed in this list
+    def _discard(self, entry):
+        found = False
+
+        for kind, index in self._indexes.items():
+            key = _index_keys[kind](entry)
+            bucket = index.get(key)
+
+            if bucket is not None and id(entry) in bucket:
+                del bucket[id(entry)]
+                found = True
+
+                if len(bucket) == 0:
+                    del index[key]
+
+        return found
+
+    def _invalidate(self):
+        self._indexes.clear()
+
+    def append(self, entry):
+        super().append(entry)
+
+        if len(self._indexes) > 0:
+            self._add(entry)
+            entry._add_list(self)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def __iadd__(self, entries):
+        self.extend(entries)
+        return self
+
+    def insert(self, i, entry):
+        super().insert(i, entry)
+        self._invalidate()
+
+    def remove(self, entry):
+        super().remove(entry)
+        self._invalidate()
+
+    def pop(self, i=-1):
+        entry = super().pop(i)
+        self._invalidate()
+        return entry
+
+    def clear(self):
+        super().clear()
+        self._invalidate()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._invalidate()
+
+    def reverse(self):
+        super().reverse()
+        self._invalidate()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._invalidate()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._invalidate()
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._invalidate()
+        return self
+
+    def search(self, type_id=-1, group_id=-1, instance_id=-1, resource_id=-1, entry_name=''):
+        entry_name = entry_name.lower()
+
+        #use the most specific index available
+        if type_id != -1 and group_id != -1 and instance_id != -1 and resource_id != -1:
+            candidates = self._get_index('tgir').get((type_id, group_id, instance_id, resource_id), {}).values()
+        elif type_id != -1 and group_id != -1 and instance_id != -1:
+            candidates = self._get_index('tgi').get((type_id, group_id, instance_id), {}).values()
+        elif type_id != -1 and group_id != -1:
+            candidates = self._get_index('tg').get((type_id, group_id), {}).values()
+        elif type_id != -1:
+            candidates = self._get_index('t').get(type_id, {}).values()
+        elif instance_id != -1:
+            candidates = self._get_index('i').get(instance_id, {}).values()
+        elif entry_name != '':
+            candidates = [entry for name, bucket in self._get_index('name').items() if entry_name in name for entry in bucket.values()]
+        else:
+            candidates = self
+
+        return [entry for entry in candidates if _matches(entry, type_id, group_id, instance_id, resource_id, entry_name)]
+
+#stores the index of a package in parallel arrays instead of Entry objects
+#bulk operations like searching run over the arrays without creating any objects
+class CompactIndex:
+    def __init__(self):
+        self.path = ''
+        self.header = Header()
+        self.types = array('I')
+        self.groups = array('I')
+        self.instances = array('I')
+        self.resources = array('I')
+        self.locations = array('I')
+        self.sizes = array('I')
+        self.compressed = array('B')
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+
+        if i < 0 or i >= len(self):
+            raise IndexError('index out of range')
+
+        return IndexEntry(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield IndexEntry(self, i)
+
+    def append(self, type_id, group_id, instance_id, resource_id, location, size, compressed=False):
+        self.types.append(type_id)
+        self.groups.append(group_id)
+        self.instances.append(instance_id)
+        self.resources.append(resource_id)
+        self.locations.append(location)
+        self.sizes.append(size)
+        self.compressed.append(compressed)
+
+    #locations and sizes default to the ones of the entries
+    def from_entries(entries, locations=None, sizes=None):
+        index = CompactIndex()
+        index.types = array('I', (entry.type for entry in entries))
+        index.groups = array('I', (entry.group for entry in entries))
+        index.instances = array('I', (entry.instance for entry in entries))
+        index.resources = array('I', (entry.resource for entry in entries))
+        index.locations = array('I', (entry._location for entry in entries) if locations is None else locations)
+        index.sizes = array('I', (entry._size for entry in entries) if sizes is None else sizes)
+        index.compressed = array('B', (entry.compressed for entry in entries))
+
+        return index
+
+    #reads the header, the index, and the CLST of a package file without reading any other entries
+    def unpack(path):
+        with open(path, 'rb') as file:
+            header = _read_header(file)
+            index = CompactIndex.read(file, header)
+            index._read_clst(file)
+
+        index.path = path
+        index.header = header
+        return index
+
+    #reads the index described by the header from a file
+    def read(file, header):
+        index = CompactIndex()
+        index.header = header
+
+        if header.index_minor_version == 2:
+            fields = 6
+        else:
+            fields = 5
+
+        count = header.index_entry_count
+
+        file.seek(header.index_location)
+        stream = StructIO(file.read(header.index_size))
+
+        #columns are extracted from the interleaved values with extended slices
+        values = stream.read_array(4, count * fields)
+
+        index.types = values[0::fields]
+        index.groups = values[1::fields]
+        index.instances = values[2::fields]
+
+        if fields == 6:
+            index.resources = values[3::fields]
+        else:
+            index.resources = array('I', bytes(count * 4))
+
+        index.locations = values[fields - 2::fields]
+        index.sizes = values[fields - 1::fields]
+        index.compressed = array('B', bytes(count))
+
+        return index
+
+    #sets the compressed flags from the CLST in the file
+    def _read_clst(self, file):
+        results = self.search(0xE86B1EEF)
+
+        if len(results) > 0:
+            file.seek(results[0].location)
+            clst_entries = _read_clst(StructIO(file.read(results[0].size)), self.header.index_minor_version)
+            self.compressed = array('B', (tgir in clst_entries for tgir in zip(self.types, self.groups, self.instances, self.resources)))
+
+    #returns the index in the binary format of the package index
+    def pack(self, minor_version=2):
+        if minor_version == 2:
+            columns = [self.types, self.groups, self.instances, self.resources, self.locations, self.sizes]
+        else:
+            columns = [self.types, self.groups, self.instances, self.locations, self.sizes]
+
+        values = array('I', bytes(len(self) * len(columns) * 4))
+        for i, column in enumerate(columns):
+            values[i::len(columns)] = column
+
+        if sys.byteorder == 'big':
+            values.byteswap()
+
+        return values.tobytes()
+
+    #same as the search function, returns a list of IndexEntry
+    def search(self, type_id=-1, group_id=-1, instance_id=-1, resource_id=-1):
+        criteria = [(column, value) for column, value in ((self.types, type_id), (self.groups, group_id), (self.instances, instance_id), (self.resources, resource_id)) if value != -1]
+
+        if len(criteria) == 0:
+            return list(self)
+
+        column, value = criteria[0]
+        positions = _find_all(column, value)
+
+        for column, value in criteria[1:]:
+            positions = [i for i in positions if column[i] == value]
+
+        return [IndexEntry(self, i) for i in positions]
+
+    #reads the entries referenced by a list of IndexEntry from the package file and returns them as Entry objects
+    def load(self, index_entries):
+        entries = []
+
+        with open(self.path, 'rb') as file:
+            identity = _file_identity(file)
+
+            for index_entry in index_entries:
+                i = index_entry.position
+                file.seek(self.locations[i])
+                content = file.read(self.sizes[i])
+                entry = Entry(self.types[i], self.groups[i], self.instances[i], self.resources[i], self.locations[i], self.sizes[i], content=content, compressed=bool(self.compressed[i]))
+                entry._file = identity
+                entry._file_compressed = entry.compressed
+                entries.append(entry)
+
+        return entries
+
+#returns the positions of value in an array of 4 byte integers
+#the scan is done by bytes.find, so only the matches are visited in Python
+def _find_all(column, value):
+    data = column.tobytes()
+    pattern = array('I', [value]).tobytes()
+    positions = []
+
+    location = data.find(pattern)
+    while location != -1:
+        if location % 4 == 0:
+            positions.append(location // 4)
+            location = data.find(pattern, location + 4)
+        else:
+            location = data.find(pattern, location + 1)
+
+    return positions
+
+#a read-only view of an entry in a CompactIndex
+class IndexEntry:
+    __slots__ = ('index', 'position')
+
+    def __init__(self, index, position):
+        self.index = index
+        self.position = position
+
+    type = property(lambda self: self.index.types[self.position])
+    group = property(lambda self: self.index.groups[self.position])
+    instance = property(lambda self: self.index.instances[self.position])
+    resource = property(lambda self: self.index.resources[self.position])
+    location = property(lambda self: self.index.locations[self.position])
+    size = property(lambda self: self.index.sizes[self.position])
+    compressed = property(lambda self: bool(self.index.compressed[self.position]))
+
+    def __str__(self):
+        return 'Type: 0x{:08X}, Group: 0x{:08X}, Instance: 0x{:08X}, Resource: 0x{:08X}'.format(self.type, self.group, self.instance, self.resource)
+
+    def load(self):
+        return self.index.load([self])[0]
+
 class Package:
     def __init__(self):
         self.path = ''
         self.header = Header()
         self.entries = []
+        self._file = None
+
+    @property
+    def entries(self):
+        return self._entries
+
+    @entries.setter
+    def entries(self, entries):
+        if isinstance(entries, EntryList):
+            self._entries = entries
+        else:
+            self._entries = EntryList(entries)
 
     def copy(self):
         package = Package()
@@ -180,140 +931,153 @@ class Package:
 
         return package
 
-    def unpack(path, decompress=False, read_names=False):
+    def unpack(path, decompress=False, read_names=False, lazy=False, workers=1, stats=None):
         with open(path, 'rb') as file:
             self = Package()
             self.path = path
 
-            #read header
-            stream = StructIO(file.read(96))
-            stream.seek(4)
-
-            self.header.major_version = stream.read_int(4)
-            self.header.minor_version = stream.read_int(4)
-            self.header.major_user_version = stream.read_int(4)
-            self.header.minor_user_version = stream.read_int(4)
-            self.header.flags = stream.read_int(4)
-            self.header.created_date = stream.read_int(4)
-            self.header.modified_date = stream.read_int(4)
-            self.header.index_major_version = stream.read_int(4)
-            self.header.index_entry_count = stream.read_int(4)
-            self.header.index_location = stream.read_int(4)
-            self.header.index_size = stream.read_int(4)
-            self.header.hole_index_entry_count = stream.read_int(4)
-            self.header.hole_index_location = stream.read_int(4)
-            self.header.hole_index_size = stream.read_int(4)
-            self.header.index_minor_version = stream.read_int(4)
-            self.header.remainder = stream.read(32)
-
-            #read index
-            self.entries = []
-
-            file.seek(self.header.index_location)
-            stream = StructIO(file.read(self.header.index_size))
-
-            for i in range(self.header.index_entry_count):
-                if self.header.index_minor_version == 2:
-                    type_id, group_id, instance_id, resource_id, location, size = stream.read_ints(4, 6)
-                else:
-                    type_id, group_id, instance_id, location, size = stream.read_ints(4, 5)
-                    resource_id = 0
+            with _phase(stats, 'index'):
+                self.header = _read_header(file)
+                index = CompactIndex.read(file, self.header)
+                index._read_clst(file)
 
-                self.entries.append(Entry(type_id, group_id, instance_id, resource_id, location, size))
+                self.entries = [Entry(*record) for record in zip(index.types, index.groups, index.instances, index.resources, index.locations, index.sizes)]
+                identity = _file_identity(file)
 
-            #read entries
-            for entry in self.entries:
-                file.seek(entry._location)
-                entry.buffer = file.read(entry._size)
+                for entry, compressed in zip(self.entries, index.compressed):
+                    entry.compressed = bool(compressed)
+                    entry._file = identity
+                    entry._file_compressed = entry.compressed
 
-        #read CLST
-        #using a set for speed
-        clst_entries = set()
-        results = search(self.entries, 0xE86B1EEF)
+            self._file = identity
 
-        if len(results) > 0:
-            clst = results[0]
+            if stats is not None:
+                stats.bytes_read += 96 + self.header.index_size
 
-            if self.header.index_minor_version == 2:
-                entry_size = 20
-            else:
-                entry_size = 16
+            #read entries
+            with _phase(stats, 'read'):
+                if lazy:
+                    source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
 
-            for i in range(len(clst) // entry_size):
-                if self.header.index_minor_version == 2:
-                    type_id, group_id, instance_id, resource_id, uncompressed_size = clst.read_ints(4, 5)
+                    for entry in self.entries:
+                        entry._source = source
                 else:
-                    type_id, group_id, instance_id, uncompressed_size = clst.read_ints(4, 4)
-                    resource_id = 0
+                    for entry in self.entries:
+                        file.seek(entry._location)
+                        entry._set_content(file.read(entry._size))
 
-                clst_entries.add((type_id, group_id, instance_id, resource_id))
+                    if stats is not None:
+                        stats.bytes_read += sum(index.sizes)
 
-            clst.seek(0)
+        #decompress entries
+        if decompress:
+            with _phase(stats, 'decompress'):
+                _map(lambda entry: _decompress(entry, stats), self.entries, workers)
 
-            #check if compressed
-            for entry in self.entries:
-                entry.compressed = (entry.type, entry.group, entry.instance, entry.resource) in clst_entries
+        #read entry names
+        if read_names:
+            with _phase(stats, 'read_names'):
+                _map(Entry.read_name, self.entries, workers)
 
-            #decompress entries
-            if decompress:
-                for entry in self.entries:
-                    try:
-                        entry.decompress()
-                    except CompressionError:
-                        pass
+        return self
+
+    #same as unpack, but the file is read and the entries are processed by executor (the default executor of the event loop if None)
+    #entries are decompressed and their names are read in chunks of chunk_size entries
+    #concurrency is the number of tasks that run in the executor at the same time, it can also be an asyncio.Semaphore shared between calls
+    async def unpack_async(path, decompress=False, read_names=False, lazy=False, executor=None, chunk_size=64, concurrency=4, stats=None):
+        loop = asyncio.get_running_loop()
+        semaphore = _semaphore(concurrency)
+
+        async with semaphore:
+            self = await loop.run_in_executor(executor, lambda: Package.unpack(path, lazy=lazy, stats=stats))
+
+        if decompress:
+            with _phase(stats, 'decompress'):
+                await _map_async(lambda entry: _decompress(entry, stats), self.entries, executor, chunk_size, semaphore)
 
-        #read entry names
         if read_names:
-            for entry in self.entries:
-                try:
-                    entry.read_name()
-                except CompressionError:
-                    pass
+            with _phase(stats, 'read_names'):
+                await _map_async(Entry.read_name, self.entries, executor, chunk_size, semaphore)
 
         return self
 
-    def pack_into(self, path, compress=False):
-        #compress entries
+    #same as pack_into, but the entries are compressed and the file is written by executor, see unpack_async
+    #the package should not be modified until it finishes
+    async def pack_into_async(self, path, compress=False, level=None, executor=None, chunk_size=64, concurrency=4, stats=None, incremental=False, precheck=True):
+        loop = asyncio.get_running_loop()
+        semaphore = _semaphore(concurrency)
+
         if compress:
-            for entry in self.entries:
-                entry.compress()
+            with _phase(stats, 'compress'):
+                if stats is None:
+                    function = lambda entry: entry.compress(level, precheck)
+                else:
+                    function = lambda entry: _compress(entry, level, precheck, stats)
 
-        #check for repeated compressed entries, decompress repeats
-        compressed_entries = {}
-        for entry in self.entries:
-            if entry.compressed:
-                tgir = (entry.type, entry.group, entry.instance, entry.resource)
+                await _map_async(function, self.entries, executor, chunk_size, semaphore)
+
+        async with semaphore:
+            await loop.run_in_executor(executor, lambda: self.pack_into(path, stats=stats, incremental=incremental))
 
-                if tgir in compressed_entries:
-                    entry.decompress()
-                    compressed_entries[tgir].decompress()
+    def pack_into(self, path, compress=False, workers=1, level=None, stats=None, incremental=False, precheck=True):
+        #compress entries
+        if compress:
+            with _phase(stats, 'compress'):
+                if stats is None:
+                    _map(lambda entry: entry.compress(level, precheck), self.entries, workers)
                 else:
-                    compressed_entries[tgir] = entry
+                    _map(lambda entry: _compress(entry, level, precheck, stats), self.entries, workers)
 
-        #make CLST
-        results = search(self.entries, 0xE86B1EEF)
-        compressed_entries = [entry for entry in self.entries if entry.compressed]
+        #entries that are still stored in the file are left in place by incremental saves
+        #unless they were compressed since, then the compressed content is appended instead
+        stored = set()
 
-        if len(results) > 0:
-            for result in results:
-                self.entries.remove(result)
+        if incremental:
+            if self._file is not None and _path_identity(path) == self._file:
+                stored = {id(entry) for entry in self.entries if entry._file == self._file and (entry._file_compressed or not entry.compressed)}
+            else:
+                incremental = False
 
-        if len(compressed_entries) > 0:
-            clst = Entry(0xE86B1EEF, 0xE86B1EEF, 0x286B1F03, 0x00000000)
+        #the compression of the stored entries is the one found in the file
+        is_compressed = lambda entry: entry._file_compressed if id(entry) in stored else entry.compressed
 
-            for compressed_entry in compressed_entries:
-                #uncompressed size is written in big endian
-                compressed_entry.seek(6)
-                uncompressed_size = compressed_entry.read_int(3, 'big')
+        with _phase(stats, 'clst'):
+            #check for repeated compressed entries, decompress repeats
+            compressed_entries = {}
+            for entry in self.entries:
+                if is_compressed(entry):
+                    tgir = (entry.type, entry.group, entry.instance, entry.resource)
 
-                if self.header.index_minor_version == 2:
-                    clst.write_ints((compressed_entry.type, compressed_entry.group, compressed_entry.instance, compressed_entry.resource, uncompressed_size), 4)
-                else:
-                    clst.write_ints((compressed_entry.type, compressed_entry.group, compressed_entry.instance, uncompressed_size), 4)
+                    if tgir in compressed_entries:
+                        for repeat in (entry, compressed_entries[tgir]):
+                            repeat.decompress()
+                            stored.discard(id(repeat))
+                    else:
+                        compressed_entries[tgir] = entry
+
+            #make CLST
+            #a single scan is cheaper than building the type index, which would be dropped when the old CLST is removed
+            results = [entry for entry in self.entries if entry.type == 0xE86B1EEF]
+            compressed_entries = [entry for entry in self.entries if is_compressed(entry)]
 
-                compressed_entry.seek(0)
+            if len(results) > 0:
+                self.entries[:] = [entry for entry in self.entries if entry.type != 0xE86B1EEF] #in place, so references to the list stay up to date
 
-            self.entries.append(clst)
+            if len(compressed_entries) > 0:
+                clst = Entry(0xE86B1EEF, 0xE86B1EEF, 0x286B1F03, 0x00000000)
+
+                for compressed_entry in compressed_entries:
+                    if compressed_entry.compressed:
+                        uncompressed_size = compressed_entry._read_uncompressed_size()
+                    else:
+                        uncompressed_size = len(compressed_entry) #stored compressed but decompressed since
+
+                    if self.header.index_minor_version == 2:
+                        clst.write_ints((compressed_entry.type, compressed_entry.group, compressed_entry.instance, compressed_entry.resource, uncompressed_size), 4)
+                    else:
+                        clst.write_ints((compressed_entry.type, compressed_entry.group, compressed_entry.instance, uncompressed_size), 4)
+
+                self.entries.append(clst)
 
         #use index minor version 2?
         if self.header.index_minor_version != 2:
@@ -322,87 +1086,546 @@ class Package:
                     self.header.index_minor_version = 2
                     break
 
-        temp_path = path.rsplit('.')[0] + '.tmp'
+        if incremental:
+            self._append_into(path, stored, stats)
+            return
 
-        with open(temp_path, 'wb') as file:
-            stream = StructIO()
+        temp_path = path + '.tmp'
 
-            #write header
-            stream.write(b'DBPF')
-            stream.write_int(self.header.major_version, 4)
-            stream.write_int(self.header.minor_version, 4)
-            stream.write_int(self.header.major_user_version, 4)
-            stream.write_int(self.header.minor_user_version, 4)
-            stream.write_int(self.header.flags, 4)
-            stream.write_int(self.header.created_date, 4)
-            stream.write_int(self.header.modified_date, 4)
-            stream.write_int(self.header.index_major_version, 4)
-            stream.write(b'\x00' * 24) #update later
-            stream.write_int(self.header.index_minor_version, 4)
-            stream.write(self.header.remainder)
+        #the entries keep their old locations until the file is replaced, so they are still valid if writing fails
+        lazy_entries = []
+        locations = []
+        sizes = []
 
-            file.write(stream.buffer)
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(b'\x00' * 96) #the header is written once the index is written
+
+                with _phase(stats, 'write'):
+                    #write entries, entries that were never loaded are copied straight from the memory map
+                    for entry in self.entries:
+                        location = file.tell()
+
+                        if entry._source is not None:
+                            file.write(entry._source[entry._location:entry._location + entry._size])
+                            lazy_entries.append(entry)
+                        else:
+                            file.write(entry.buffer)
+
+                        locations.append(location)
+                        sizes.append(file.tell() - location)
+
+                with _phase(stats, 'index'):
+                    #write index
+                    index_start = file.tell()
+                    file.write(CompactIndex.from_entries(self.entries, locations, sizes).pack(self.header.index_minor_version))
+                    index_end = file.tell()
+
+                    #update header info
+                    self.header.index_entry_count = len(self.entries)
+                    self.header.index_location = index_start
+                    self.header.index_size = index_end - index_start
+                    self.header.hole_index_entry_count = 0
+                    self.header.hole_index_location = 0
+                    self.header.hole_index_size = 0
+
+                    file.seek(0)
+                    file.write(_pack_header(self.header))
+        except:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
 
-            #write entries and update location and size
-            for entry in self.entries:
-                entry._location = file.tell()
-                file.write(entry.buffer)
-                entry._size = file.tell() - entry._location
+            raise
 
-            stream.clear()
+        if stats is not None:
+            stats.bytes_written += index_end
 
-            #write index
-            for entry in self.entries:
+        #release the old memory maps before replacing the file, including the ones held by the removed CLST entries,
+        #then point the lazy entries to the new file
+        for entry in lazy_entries + results:
+            entry._source = None
+            entry._view = None
+
+        results = None
+        os.replace(temp_path, path)
+        self.path = path
+
+        for entry, location, size in zip(self.entries, locations, sizes):
+            entry._location = location
+            entry._size = size
+
+        #the entries now match the content of the new file
+        with open(path, 'rb') as file:
+            identity = _file_identity(file)
+
+            if len(lazy_entries) > 0:
+                source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        for entry in self.entries:
+            entry._file = identity
+            entry._file_compressed = entry.compressed
+
+        for entry in lazy_entries:
+            entry._source = source
+
+        self._file = identity
+
+    #writes the entries that are not stored in the file at its end, followed by the index and the hole index
+    #the regions of the file that are no longer used are listed in the hole index, use compact to remove them
+    #the header is updated last, so the file is still valid if writing is interrupted
+    def _append_into(self, path, stored, stats):
+        with open(path, 'r+b') as file:
+            end = file.seek(0, os.SEEK_END)
+
+            with _phase(stats, 'write'):
+                appended = []
+
+                for entry in self.entries:
+                    if id(entry) not in stored:
+                        entry._load() #lazy entries from other files are moved to this file
+                        location = file.tell()
+                        file.write(entry.buffer)
+
+                        entry._location = location
+                        entry._size = file.tell() - location
+                        entry._file = None
+                        appended.append(entry)
+
+            #find the regions between the stored entries
+            holes = []
+            position = 96
+
+            for location, size in sorted((entry._location, entry._size) for entry in self.entries if id(entry) in stored):
+                if location > position:
+                    holes.append((position, location - position))
+
+                position = max(position, location + size)
+
+            if end > position:
+                holes.append((position, end - position))
+
+            with _phase(stats, 'index'):
+                #write index
+                index_start = file.tell()
+                file.write(CompactIndex.from_entries(self.entries).pack(self.header.index_minor_version))
+                index_end = file.tell()
+
+                #write hole index
+                stream = StructIO()
+                for hole in holes:
+                    stream.write_ints(hole, 4)
+
+                file.write(stream.buffer)
+                hole_index_end = file.tell()
+
+                #update header info
+                self.header.index_entry_count = len(self.entries)
+                self.header.index_location = index_start
+                self.header.index_size = index_end - index_start
+                self.header.hole_index_entry_count = len(holes)
+                self.header.hole_index_location = index_end if len(holes) > 0 else 0
+                self.header.hole_index_size = hole_index_end - index_end
+
+                stream.clear()
+                stream.write_int(self.header.index_entry_count, 4)
+                stream.write_int(self.header.index_location, 4)
+                stream.write_int(self.header.index_size, 4)
+                stream.write_int(self.header.hole_index_entry_count, 4)
+                stream.write_int(self.header.hole_index_location, 4)
+                stream.write_int(self.header.hole_index_size, 4)
+                stream.write_int(self.header.index_minor_version, 4)
+
+                file.seek(36)
+                file.write(stream.buffer)
+
+            file.flush()
+            identity = _file_identity(file)
+
+        if stats is not None:
+            stats.bytes_written += hole_index_end - end + 28
+
+        self.path = path
+        self._file = identity
+
+        for entry in self.entries:
+            entry._file = identity
+
+        for entry in appended:
+            entry._file_compressed = entry.compressed
+
+#writes a package file one entry at a time, only the index and the CLST records are kept in memory
+#entries are written as soon as they're added, and the header, the index, and the CLST are written by close
+class PackageWriter:
+    def __init__(self, path, header=None, compress=False, level=None, precheck=True, stats=None):
+        self.path = path
+        self.header = Header() if header is None else header.copy()
+        self.compress = compress
+        self.level = level
+        self.precheck = precheck
+        self.stats = stats
+        self.index = CompactIndex()
+        self._clst = {} #(type, group, instance, resource) -> uncompressed size of the compressed entries
+        self._tgirs = set()
+        self._repeats = set() #repeated (type, group, instance, resource) of compressed entries
+        self._temp_path = path + '.tmp'
+        self._file = open(self._temp_path, 'w+b')
+        self._file.write(b'\x00' * 96) #the header is written by close
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    #content can be a bytes-like object, a file object that is read from its current position until size bytes are read or until its end,
+    #or an iterable of bytes-like chunks
+    #the content is only held in memory as a whole if it needs to be compressed
+    def add(self, type_id, group_id, instance_id, resource_id=0, content=b'', compressed=False, size=-1):
+        if type_id == 0xE86B1EEF:
+            return #the CLST is made by close
+
+        if hasattr(content, 'read'):
+            chunks = _read_chunks(content, size)
+        elif isinstance(content, (bytes, bytearray, memoryview)):
+            chunks = [content]
+        else:
+            chunks = content
+
+        if self.compress and not compressed:
+            entry = Entry(type_id, group_id, instance_id, resource_id, content=b''.join(chunks))
+
+            if self.stats is None:
+                entry.compress(self.level, self.precheck)
+            else:
+                _compress(entry, self.level, self.precheck, self.stats)
+
+            chunks = [entry.buffer]
+            compressed = entry.compressed
+
+        location = self._file.tell()
+        head = b''
+
+        for chunk in chunks:
+            if compressed and len(head) < 9:
+                head += bytes(chunk[:9 - len(head)])
+
+            self._file.write(chunk)
+
+        tgir = (type_id, group_id, instance_id, resource_id)
+
+        if compressed:
+            #uncompressed size is written in big endian
+            self._clst[tgir] = int.from_bytes(head[6:9], 'big')
+
+        if tgir in self._tgirs:
+            if tgir in self._clst:
+                self._repeats.add(tgir)
+        else:
+            self._tgirs.add(tgir)
+
+        self.index.append(type_id, group_id, instance_id, resource_id, location, self._file.tell() - location, compressed)
+
+    #adds an Entry, lazy entries are copied from their memory map without loading them
+    def add_entry(self, entry):
+        self.add(entry.type, entry.group, entry.instance, entry.resource, entry._content(), entry.compressed)
+
+    #removes the entries added after the first count entries, such as the entries of a package that failed to be added
+    def truncate(self, count):
+        index = self.index
+
+        if count < len(index):
+            self._file.truncate(index.locations[count])
+            self._file.seek(0, os.SEEK_END)
+
+            for column in (index.types, index.groups, index.instances, index.resources, index.locations, index.sizes, index.compressed):
+                del column[count:]
+
+        #the CLST and the repeats are found again from the remaining entries, the same way as add
+        self._clst = {}
+        self._tgirs = set()
+        self._repeats = set()
+
+        for i in range(len(index)):
+            tgir = (index.types[i], index.groups[i], index.instances[i], index.resources[i])
+
+            if index.compressed[i]:
+                self._file.seek(index.locations[i] + 6)
+                self._clst[tgir] = int.from_bytes(self._file.read(3), 'big')
+
+            if tgir in self._tgirs:
+                if tgir in self._clst:
+                    self._repeats.add(tgir)
+            else:
+                self._tgirs.add(tgir)
+
+        self._file.seek(0, os.SEEK_END)
+
+    #decompresses the repeated compressed entries, then writes the CLST, the index, and the header, and moves the file to path
+    def close(self):
+        file = self._file
+        holes = []
+
+        #the decompressed content is written at the end, the compressed content is left as a hole
+        if len(self._repeats) > 0:
+            index = self.index
+
+            for i in range(len(index)):
+                tgir = (index.types[i], index.groups[i], index.instances[i], index.resources[i])
+
+                if index.compressed[i] and tgir in self._repeats:
+                    file.seek(index.locations[i])
+                    entry = Entry(*tgir, content=file.read(index.sizes[i]), compressed=True).decompress()
+                    holes.append((index.locations[i], index.sizes[i]))
+
+                    location = file.seek(0, os.SEEK_END)
+                    file.write(entry.buffer)
+                    index.locations[i] = location
+                    index.sizes[i] = len(entry)
+                    index.compressed[i] = False
+
+            for tgir in self._repeats:
+                del self._clst[tgir]
+
+        file.seek(0, os.SEEK_END)
+
+        #use index minor version 2?
+        if self.header.index_minor_version != 2 and any(self.index.resources):
+            self.header.index_minor_version = 2
+
+        #write CLST
+        if len(self._clst) > 0:
+            stream = StructIO()
+
+            for tgir, uncompressed_size in self._clst.items():
                 if self.header.index_minor_version == 2:
-                    stream.write_ints((entry.type, entry.group, entry.instance, entry.resource, entry._location, entry._size), 4)
+                    stream.write_ints(tgir + (uncompressed_size,), 4)
                 else:
-                    stream.write_ints((entry.type, entry.group, entry.instance, entry._location, entry._size), 4)
+                    stream.write_ints(tgir[:3] + (uncompressed_size,), 4)
 
-            index_start = file.tell()
+            location = file.tell()
             file.write(stream.buffer)
-            index_end = file.tell()
+            self.index.append(0xE86B1EEF, 0xE86B1EEF, 0x286B1F03, 0x00000000, location, len(stream))
 
-            stream.clear()
+        #write index
+        index_start = file.tell()
+        file.write(self.index.pack(self.header.index_minor_version))
+        index_end = file.tell()
 
-            #update header info
-            self.header.index_entry_count = len(self.entries)
-            self.header.index_location = index_start
-            self.header.index_size = index_end - index_start
-            self.header.hole_index_entry_count = 0
-            self.header.hole_index_location = 0
-            self.header.hole_index_size = 0
+        #write hole index
+        stream = StructIO()
+        for hole in sorted(holes):
+            stream.write_ints(hole, 4)
 
-            stream.write_int(self.header.index_entry_count, 4)
-            stream.write_int(self.header.index_location, 4)
-            stream.write_int(self.header.index_size, 4)
+        file.write(stream.buffer)
+        hole_index_end = file.tell()
 
-            file.seek(36)
-            file.write(stream.buffer)
+        #write header
+        self.header.index_entry_count = len(self.index)
+        self.header.index_location = index_start
+        self.header.index_size = index_end - index_start
+        self.header.hole_index_entry_count = len(holes)
+        self.header.hole_index_location = index_end if len(holes) > 0 else 0
+        self.header.hole_index_size = hole_index_end - index_end
 
-        os.replace(temp_path, path)
-        self.path = path
+        file.seek(0)
+        file.write(_pack_header(self.header))
+        file.close()
 
-def search(entries, type_id=-1, group_id=-1, instance_id=-1, resource_id=-1, entry_name=''):
-    entry_name = entry_name.lower()
+        if self.stats is not None:
+            self.stats.bytes_written += hole_index_end
+
+        os.replace(self._temp_path, self.path)
+        self.index.path = self.path
+        self.index.header = self.header
+
+    #stops writing and deletes the incomplete file
+    def discard(self):
+        self._file.close()
+        os.remove(self._temp_path)
+
+def _read_chunks(file, size, chunk_size=1 << 20):
+    while size != 0:
+        chunk = file.read(chunk_size if size < 0 else min(size, chunk_size))
+
+        if len(chunk) == 0:
+            break
 
-    results = []
+        if size > 0:
+            size -= len(chunk)
 
-    for entry in entries:
-        if type_id != -1 and type_id != entry.type:
-            continue
+        yield chunk
 
-        if group_id != -1 and group_id != entry.group:
-            continue
+#the QFS extension releases the GIL, so threads are enough to use multiple cores
+def _map(function, entries, workers):
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(function, entries))
+    else:
+        return [function(entry) for entry in entries]
 
-        if instance_id != -1 and instance_id != entry.instance:
-            continue
+#runs function on chunks of entries in executor, without running more chunks at once than allowed by semaphore
+async def _map_async(function, entries, executor, chunk_size, semaphore):
+    loop = asyncio.get_running_loop()
+    entries = list(entries)
 
-        if resource_id != -1 and resource_id != entry.resource:
-            continue
+    async def run(chunk):
+        async with semaphore:
+            await loop.run_in_executor(executor, lambda: [function(entry) for entry in chunk])
 
-        if entry_name != '' and entry_name not in entry.name.lower():
-            continue
+    await asyncio.gather(*(run(entries[i:i + chunk_size]) for i in range(0, len(entries), chunk_size)))
 
-        results.append(entry)
+def _semaphore(concurrency):
+    if isinstance(concurrency, asyncio.Semaphore):
+        return concurrency
+
+    return asyncio.Semaphore(concurrency)
+
+#identifies a version of a package file for the decompression cache
+def _file_identity(file):
+    stat = os.fstat(file.fileno())
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def _path_identity(path):
+    try:
+        with open(path, 'rb') as file:
+            return _file_identity(file)
+    except OSError:
+        return None
+
+def _phase(stats, name):
+    if stats is None:
+        return nullcontext()
+
+    return stats.phase(name)
+
+#compresses the entry and records it to stats
+def _compress(entry, level, precheck, stats):
+    if entry.compressed or entry.type == 0xE86B1EEF:
+        return
+
+    operation = 'reuse' if level is None and entry._original is not None else 'compress'
+    size = len(entry)
+
+    if precheck and operation == 'compress' and not entry.compressible():
+        stats.add_skipped(entry, True)
+        return
+
+    start = time.perf_counter()
+    entry.compress(level)
+    seconds = time.perf_counter() - start
+
+    if entry.compressed:
+        stats.add_entry(operation, entry, seconds, size, len(entry))
+    else:
+        stats.add_skipped(entry)
+
+def _decompress(entry, stats=None):
+    if stats is None or not entry.compressed:
+        try:
+            entry.decompress()
+        except CompressionError:
+            pass
+
+        return
+
+    size = len(entry)
+    start = time.perf_counter()
+
+    try:
+        entry.decompress()
+    except CompressionError:
+        return
+
+    stats.add_entry('decompress', entry, time.perf_counter() - start, size, len(entry))
+
+def _pack_header(header):
+    stream = StructIO()
+
+    stream.write(b'DBPF')
+    stream.write_int(header.major_version, 4)
+    stream.write_int(header.minor_version, 4)
+    stream.write_int(header.major_user_version, 4)
+    stream.write_int(header.minor_user_version, 4)
+    stream.write_int(header.flags, 4)
+    stream.write_int(header.created_date, 4)
+    stream.write_int(header.modified_date, 4)
+    stream.write_int(header.index_major_version, 4)
+    stream.write_int(header.index_entry_count, 4)
+    stream.write_int(header.index_location, 4)
+    stream.write_int(header.index_size, 4)
+    stream.write_int(header.hole_index_entry_count, 4)
+    stream.write_int(header.hole_index_location, 4)
+    stream.write_int(header.hole_index_size, 4)
+    stream.write_int(header.index_minor_version, 4)
+    stream.write(header.remainder)
+
+    return stream.buffer
+
+def _read_header(file):
+    header = Header()
+
+    stream = StructIO(file.read(96))
+    stream.seek(4)
+
+    header.major_version = stream.read_int(4)
+    header.minor_version = stream.read_int(4)
+    header.major_user_version = stream.read_int(4)
+    header.minor_user_version = stream.read_int(4)
+    header.flags = stream.read_int(4)
+    header.created_date = stream.read_int(4)
+    header.modified_date = stream.read_int(4)
+    header.index_major_version = stream.read_int(4)
+    header.index_entry_count = stream.read_int(4)
+    header.index_location = stream.read_int(4)
+    header.index_size = stream.read_int(4)
+    header.hole_index_entry_count = stream.read_int(4)
+    header.hole_index_location = stream.read_int(4)
+    header.hole_index_size = stream.read_int(4)
+    header.index_minor_version = stream.read_int(4)
+    header.remainder = stream.read(32)
+
+    return header
+
+#returns a set of the (type, group, instance, resource) of the compressed entries listed in a CLST
+def _read_clst(clst, index_minor_version):
+    #using a set for speed
+    if index_minor_version == 2:
+        return {record[:4] for record in clst.iter_records(4, 5, len(clst) // 20)}
+    else:
+        return {record[:3] + (0,) for record in clst.iter_records(4, 4, len(clst) // 16)}
+
+def _matches(entry, type_id, group_id, instance_id, resource_id, entry_name):
+    if type_id != -1 and type_id != entry.type:
+        return False
+
+    if group_id != -1 and group_id != entry.group:
+        return False
+
+    if instance_id != -1 and instance_id != entry.instance:
+        return False
+
+    if resource_id != -1 and resource_id != entry.resource:
+        return False
+
+    if entry_name != '' and entry_name not in entry.name.lower():
+        return False
+
+    return True
+
+def search(entries, type_id=-1, group_id=-1, instance_id=-1, resource_id=-1, entry_name=''):
+    if isinstance(entries, Package):
+        entries = entries.entries
+
+    #use the indexes of entry lists
+    if isinstance(entries, EntryList):
+        return entries.search(type_id, group_id, instance_id, resource_id, entry_name)
+
+    entry_name = entry_name.lower()
+    return [entry for entry in entries if _matches(entry, type_id, group_id, instance_id, resource_id, entry_name)]
 
-    return results
\ No newline at end of file
+#rewrites a package file without the holes left by incremental saves
+def compact(path):
+    Package.unpack(path, lazy=True).pack_into(path)
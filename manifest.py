@@ -0,0 +1,170 @@
+from .dbpf import CompactIndex, Header, Package, PackageWriter, _read_header
+import hashlib
+import json
+import mmap
+import os
+
+#hashes of the content of the entries of a package file
+#the stored bytes of each entry are hashed as they are, so compressed entries don't need to be decompressed,
+#but an entry that was only compressed or decompressed is seen as changed
+class Manifest:
+    def __init__(self):
+        self.path = ''
+        self.size = 0
+        self.mtime = 0
+        self.header = Header()
+        self.records = [] #(type, group, instance, resource, compressed, hash) in the order of the index, without the CLST
+        self.patch = None #hash of the records of the patch that this target manifest was written for, see make_patch
+
+    #hashes the entries of the package file at path
+    def create(path):
+        self = Manifest()
+        self.path = path
+
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            self.size = stat.st_size
+            self.mtime = stat.st_mtime_ns
+            self.header = _read_header(file)
+            index = CompactIndex.read(file, self.header)
+            index._read_clst(file)
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                view = memoryview(source)
+
+                for i in range(len(index)):
+                    if index.types[i] != 0xE86B1EEF:
+                        location = index.locations[i]
+                        content_hash = _hash(view[location:location + index.sizes[i]])
+                        self.records.append((index.types[i], index.groups[i], index.instances[i], index.resources[i], bool(index.compressed[i]), content_hash))
+
+                view.release()
+
+        return self
+
+    #reads the sidecar manifest of the package file at path if it's up to date, otherwise creates it and writes it
+    def load(path):
+        manifest_path = path + '.manifest'
+
+        if os.path.isfile(manifest_path):
+            self = Manifest.read(manifest_path)
+            stat = os.stat(path)
+
+            if self.size == stat.st_size and self.mtime == stat.st_mtime_ns:
+                self.path = path
+                return self
+
+        self = Manifest.create(path)
+        self.write(manifest_path)
+        return self
+
+    def read(manifest_path):
+        with open(manifest_path, encoding='utf-8') as file:
+            data = json.load(file)
+
+        self = Manifest()
+        self.size = data['size']
+        self.mtime = data['mtime']
+
+        for key, value in data['header'].items():
+            setattr(self.header, key, value)
+
+        self.header.remainder = bytes.fromhex(data['header']['remainder'])
+        self.records = [tuple(record) for record in data['records']]
+        self.patch = data.get('patch')
+
+        return self
+
+    #writes the manifest to manifest_path, or to the sidecar of the package file if manifest_path is None
+    def write(self, manifest_path=None):
+        if manifest_path is None:
+            manifest_path = self.path + '.manifest'
+
+        header = vars(self.header).copy()
+        header['remainder'] = self.header.remainder.hex()
+
+        with open(manifest_path, 'w', encoding='utf-8') as file:
+            json.dump({'size': self.size, 'mtime': self.mtime, 'header': header, 'records': self.records, 'patch': self.patch}, file)
+
+    #returns a dictionary with the lists of the (type, group, instance, resource) that were added, removed, and changed in other
+    def diff(self, other):
+        base = _group_hashes(self.records)
+        target = _group_hashes(other.records)
+
+        return {
+            'added': [tgir for tgir in target if tgir not in base],
+            'removed': [tgir for tgir in base if tgir not in target],
+            'changed': [tgir for tgir in target if tgir in base and base[tgir] != target[tgir]],
+        }
+
+#writes a package containing the entries of the package at target_path that are not found in the package at base_path,
+#and writes the manifest of the target package next to the patch (patch_path + '.target.manifest'),
+#which is kept apart from the sidecar of the patch so that loading the manifest of the patch doesn't replace it
+#returns the diff from the base package to the target package
+def make_patch(base_path, target_path, patch_path):
+    base = Manifest.load(base_path)
+    target = Manifest.load(target_path)
+    base_hashes = {record[:4] + record[5:] for record in base.records}
+
+    package = Package.unpack(target_path, lazy=True)
+
+    with PackageWriter(patch_path, target.header) as writer:
+        for record, entry in zip(target.records, (entry for entry in package.entries if entry.type != 0xE86B1EEF)):
+            if record[:4] + record[5:] not in base_hashes:
+                writer.add_entry(entry)
+
+    package = None #releases the memory map
+    target.patch = _hash_records(Manifest.create(patch_path).records)
+    target.write(patch_path + '.target.manifest')
+
+    return base.diff(target)
+
+#rebuilds the target package from the package at base_path and a patch made by make_patch, and writes it to output_path
+#raises a ValueError if the target manifest was not written for this patch, or if an entry of the target package can't be found in either package
+def apply_patch(base_path, patch_path, output_path):
+    target = Manifest.read(patch_path + '.target.manifest')
+
+    if target.patch is None or target.patch != _hash_records(Manifest.create(patch_path).records):
+        raise ValueError('The target manifest was not written for this patch')
+
+    writer = PackageWriter(output_path, target.header)
+
+    try:
+        _add_records(writer, target.records, (base_path, patch_path))
+    except:
+        writer.discard()
+        raise
+
+    writer.close() #the memory maps of the packages were released when _add_records returned
+
+#adds the entries described by records to the writer, taking their content from the packages at paths
+#the packages are only referenced from here, so their memory maps are released once it returns
+def _add_records(writer, records, paths):
+    entries = {}
+
+    for path in paths:
+        for entry in Package.unpack(path, lazy=True).entries:
+            if entry.type != 0xE86B1EEF:
+                entries[(entry.type, entry.group, entry.instance, entry.resource, _hash(entry._content()))] = entry
+
+    for type_id, group_id, instance_id, resource_id, compressed, content_hash in records:
+        entry = entries.get((type_id, group_id, instance_id, resource_id, content_hash))
+
+        if entry is None:
+            raise ValueError('Entry (0x{:08X}, 0x{:08X}, 0x{:08X}, 0x{:08X}) not found in the base package or the patch'.format(type_id, group_id, instance_id, resource_id))
+
+        writer.add(type_id, group_id, instance_id, resource_id, entry._content(), compressed)
+
+def _hash(content):
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+#hash of a list of records, which is the same for records read from a manifest file
+def _hash_records(records):
+    return _hash(json.dumps([list(record) for record in records]).encode('utf-8'))
+
+def _group_hashes(records):
+    hashes = {}
+    for record in records:
+        hashes.setdefault(record[:4], []).append(record[5])
+
+    return hashes
@@ -60,6 +60,15 @@ struct dbpf_compressed_file_header  // 9 bytes
 
 #define DBPF_COMPRESSION_QFS (0xFB10)
 
+// copies n bytes in blocks of 8 bytes, which can write up to 7 bytes past dst + n
+// memcpy with a constant size compiles to unaligned loads and stores
+static inline void copy_blocks(byte* dst, const byte* src, int n) {
+    do {
+        memcpy(dst, src, 8);
+        dst += 8; src += 8; n -= 8;
+    } while (n > 0);
+}
+
 static bool decompress(const byte* src, int compressed_size, byte* dst, int uncompressed_size, bool truncate) {
     const byte* src_end = src + compressed_size;
     byte* dst_end = dst + uncompressed_size;
@@ -128,7 +137,11 @@ static bool decompress(const byte* src, int compressed_size, byte* dst, int unco
                 return false;
         }
         if (lit) {
-            memcpy(dst, src, lit);
+            // literals are copied in blocks when there is room to write past them
+            if (lit + 8 <= src_end - src && lit + 8 <= dst_end - dst)
+                copy_blocks(dst, src, lit);
+            else
+                memcpy(dst, src, lit);
             dst += lit; src += lit;
         }
         if (copy) {
@@ -137,6 +150,10 @@ static bool decompress(const byte* src, int compressed_size, byte* dst, int unco
             if (offset == 1) {
                 memset(dst, dst[-1], copy);
                 dst += copy;
+            } else if (offset >= 8 && copy + 8 <= dst_end - dst) {
+                // each block only reads bytes that were already written
+                copy_blocks(dst, dst - offset, copy);
+                dst += copy;
             } else {
                 do {
                     *dst = *(dst-offset);
@@ -160,11 +177,29 @@ static bool decompress(const byte* src, int compressed_size, byte* dst, int unco
 
 #define MIN_LOOKAHEAD (MAX_MATCH+MIN_MATCH+1)
 
-// corresponds to zlib compression level 5
-#define GOOD_LENGTH 8
-#define MAX_LAZY    16
-#define NICE_LENGTH 32
-#define MAX_CHAIN   32
+/* Compression parameters for each level, corresponding to zlib's configuration table.
+ * Levels 1 to 3 don't use lazy matching, in which case max_lazy is the longest match
+ * for which the matched strings are still inserted into the hash table.
+ */
+struct config {
+    unsigned good_length;   /* reduce lazy search above this match length */
+    unsigned max_lazy;      /* do not perform lazy search above this match length */
+    unsigned nice_length;   /* quit search above this match length */
+    unsigned max_chain;
+    bool lazy;
+};
+
+static const config configuration_table[10] = {
+/* 0 */ {8,    16,   32,   32, true},   /* unused, same as the default */
+/* 1 */ {4,     4,    8,    4, false},  /* fastest */
+/* 2 */ {4,     5,   16,    8, false},
+/* 3 */ {4,     6,   32,   32, false},
+/* 4 */ {4,     4,   16,   16, true},
+/* 5 */ {8,    16,   32,   32, true},   /* default */
+/* 6 */ {8,    16,  128,  128, true},
+/* 7 */ {8,    32,  128,  256, true},
+/* 8 */ {32,  128, 1028, 1024, true},
+/* 9 */ {32, 1028, 1028, 4096, true}}; /* maximum compression */
 
 #define HASH_BITS 16
 #define HASH_SIZE 65536
@@ -311,11 +346,12 @@ static inline unsigned longest_match(
     unsigned const pos,
     unsigned const remaining,
     unsigned const prev_length,
-    unsigned* pmatch_start)
+    unsigned* pmatch_start,
+    const config* const cfg)
 {
-    unsigned chain_length = MAX_CHAIN;         /* max hash chain length */
+    unsigned chain_length = cfg->max_chain;    /* max hash chain length */
     int best_len = prev_length;                /* best match length so far */
-    int nice_match = NICE_LENGTH;              /* stop if match long enough */
+    int nice_match = cfg->nice_length;         /* stop if match long enough */
     int limit = pos > MAX_DIST ? pos - MAX_DIST + 1 : 0;
     /* Stop when cur_match becomes < limit. */
 
@@ -330,7 +366,7 @@ static inline unsigned longest_match(
     byte scan_end   = scan[best_len];
 
     /* Do not waste too much time if we already have a good match: */
-    if (prev_length >= GOOD_LENGTH) {
+    if (prev_length >= cfg->good_length) {
         chain_length >>= 2;
     }
     /* Do not look for matches beyond the end of the input. This is necessary
@@ -373,7 +409,7 @@ static inline unsigned longest_match(
 }
 
 /* Returns the end of the compressed data if successful, or NULL if we overran the output buffer */
-static byte* compress(const byte* src, const byte* srcend, byte* dst, byte* dstend, bool pad) {
+static byte* compress(const byte* src, const byte* srcend, byte* dst, byte* dstend, bool pad, const config* cfg) {
     unsigned match_start = 0;
     unsigned match_length = MIN_MATCH-1;           /* length of best match */
     bool match_available = false;         /* set if previous match exists */
@@ -388,6 +424,60 @@ static byte* compress(const byte* src, const byte* srcend, byte* dst, byte* dste
     hash.update(src[0]);
     hash.update(src[1]);
 
+    while (remaining && !cfg->lazy) {
+        /* Without lazy matching, a match is emitted as soon as it's found
+         * (adapted from zlib's deflate_fast).
+         */
+        match_length = MIN_MATCH-1;
+
+        int hash_head = -1;
+
+        if (remaining >= MIN_MATCH) {
+            hash.update(src[pos + MIN_MATCH-1]);
+            hash_head = hash.insert(pos);
+        }
+
+        if (hash_head >= 0 && pos - hash_head <= MAX_DIST) {
+            match_length = longest_match (hash_head, hash, src, srcend, pos, remaining, MIN_MATCH-1, &match_start, cfg);
+
+            /* If we can't encode it, drop it. */
+            if ((match_length <= 3 && pos - match_start > 1024) || (match_length <= 4 && pos - match_start > 16384))
+                match_length = MIN_MATCH-1;
+        }
+
+        if (match_length >= MIN_MATCH) {
+            if (!compressed_output.emit(match_start, pos, match_length))
+                return 0;
+
+            remaining -= match_length;
+
+            /* Insert new strings in the hash table only if the match length
+             * is not too large. This saves time but degrades compression.
+             */
+            if (match_length <= cfg->max_lazy) {
+                unsigned count = match_length - 1;
+                do {
+                    ++pos;
+                    if (src+pos <= srcend-MIN_MATCH) {
+                        hash.update(src[pos + MIN_MATCH-1]);
+                        hash.insert(pos);
+                    }
+                } while (--count != 0);
+                ++pos;
+            } else {
+                pos += match_length;
+                /* The hash only depends on the last MIN_MATCH bytes, so this resynchronizes it */
+                if (remaining >= MIN_MATCH) {
+                    hash.update(src[pos]);
+                    hash.update(src[pos + 1]);
+                }
+            }
+        } else {
+            ++pos;
+            --remaining;
+        }
+    }
+
     while (remaining) {
         unsigned prev_length = match_length;
         unsigned prev_match = match_start;
@@ -400,8 +490,8 @@ static byte* compress(const byte* src, const byte* srcend, byte* dst, byte* dste
             hash_head = hash.insert(pos);
         }
 
-        if (hash_head >= 0 && prev_length < MAX_LAZY && pos - hash_head <= MAX_DIST) {
-            match_length = longest_match (hash_head, hash, src, srcend, pos, remaining, prev_length, &match_start);
+        if (hash_head >= 0 && prev_length < cfg->max_lazy && pos - hash_head <= MAX_DIST) {
+            match_length = longest_match (hash_head, hash, src, srcend, pos, remaining, prev_length, &match_start, cfg);
 
             /* If we can't encode it, drop it. */
             if ((match_length <= 3 && pos - match_start > 1024) || (match_length <= 4 && pos - match_start > 16384))
@@ -461,11 +551,22 @@ bool qfs_decompress(const byte* src, int srclen, byte* dst, int dstlen) {
 	return decompress(src, srclen, dst, dstlen, false);
 }
 
+bool qfs_decompress_partial(const byte* src, int srclen, byte* dst, int dstlen) {
+	return decompress(src, srclen, dst, dstlen, true);
+}
+
 int qfs_compress(const byte* src, int srclen, byte* dst, int dstlen) {
-    byte* dstend = compress(src, src+srclen, dst, dst+dstlen, false);
+    return qfs_compress_level(src, srclen, dst, dstlen, QFS_DEFAULT_LEVEL);
+}
+
+int qfs_compress_level(const byte* src, int srclen, byte* dst, int dstlen, int level) {
+    if (level < 1 || level > 9)
+        level = QFS_DEFAULT_LEVEL;
+
+    byte* dstend = compress(src, src+srclen, dst, dst+dstlen, false, &configuration_table[level]);
     if (dstend) {
         return dstend - dst;
     } else {
         return 0;
     }
-}
\ No newline at end of file
+}
@@ -13,6 +13,8 @@
 
 typedef unsigned char byte;
 
+#define QFS_DEFAULT_LEVEL 5
+
 extern "C" {
 
 /*
@@ -21,12 +23,24 @@ extern "C" {
  */
 int qfs_compress(const byte* src, int srclen, byte* dst, int dstlen);
 
+/*
+ * Same as qfs_compress, with a compression level between 1 (fastest) and 9 (best compression).
+ * Invalid levels are replaced by QFS_DEFAULT_LEVEL.
+ */
+int qfs_compress_level(const byte* src, int srclen, byte* dst, int dstlen, int level);
+
 /*
  * Decompresses src and stores the output in dst.
  * Returns a boolean indicating if the decompression was successful.
  */
 bool qfs_decompress(const byte* src, int srclen, byte* dst, int dstlen);
 
+/*
+ * Decompresses only the first dstlen bytes of src and stores them in dst.
+ * Decoding stops as soon as dst is full. Returns a boolean indicating if the decompression was successful.
+ */
+bool qfs_decompress_partial(const byte* src, int srclen, byte* dst, int dstlen);
+
 }
 
 #endif
\ No newline at end of file
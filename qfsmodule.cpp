@@ -0,0 +1,170 @@
+/*
+ * Python extension module exposing the RefPack compression routines in qfs.cpp.
+ *
+ * The functions accept any object supporting the buffer protocol (bytes,
+ * bytearray, memoryview, mmap), write their output directly into a new bytes
+ * object, and release the GIL while the data is being processed.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <limits.h>
+
+#include "qfs.h"
+
+PyDoc_STRVAR(compress_doc,
+"compress(src, max_size, level=5) -> bytes or None\n\n"
+"Compresses src using a compression level between 1 (fastest) and 9 (best compression).\n"
+"Returns None if the compressed output does not fit in max_size bytes.");
+
+static PyObject* py_compress(PyObject* self, PyObject* args) {
+    Py_buffer src;
+    Py_ssize_t dstlen;
+    int level = QFS_DEFAULT_LEVEL;
+
+    if (!PyArg_ParseTuple(args, "y*n|i:compress", &src, &dstlen, &level))
+        return NULL;
+
+    if (level < 1 || level > 9) {
+        PyBuffer_Release(&src);
+        PyErr_Format(PyExc_ValueError, "compression level '%d' not supported", level);
+        return NULL;
+    }
+
+    if (src.len < 2 || src.len > INT_MAX || dstlen <= 0) {
+        PyBuffer_Release(&src);
+        Py_RETURN_NONE;
+    }
+
+    if (dstlen > INT_MAX)
+        dstlen = INT_MAX;
+
+    PyObject* dst = PyBytes_FromStringAndSize(NULL, dstlen);
+    if (!dst) {
+        PyBuffer_Release(&src);
+        return NULL;
+    }
+
+    int written;
+    Py_BEGIN_ALLOW_THREADS
+    written = qfs_compress_level((const byte*)src.buf, (int)src.len, (byte*)PyBytes_AS_STRING(dst), (int)dstlen, level);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&src);
+
+    if (!written) {
+        Py_DECREF(dst);
+        Py_RETURN_NONE;
+    }
+
+    if (written != dstlen && _PyBytes_Resize(&dst, written) < 0)
+        return NULL;
+
+    return dst;
+}
+
+PyDoc_STRVAR(decompress_doc,
+"decompress(src, size, partial=False) -> bytes or None\n\n"
+"Decompresses src into size bytes. If partial is True, then only the first size bytes\n"
+"of the content are decoded. Returns None if src is not valid compressed data of that size.");
+
+static PyObject* py_decompress(PyObject* self, PyObject* args) {
+    Py_buffer src;
+    Py_ssize_t dstlen;
+    int partial = 0;
+
+    if (!PyArg_ParseTuple(args, "y*n|p:decompress", &src, &dstlen, &partial))
+        return NULL;
+
+    if (src.len > INT_MAX || dstlen < 0 || dstlen > INT_MAX) {
+        PyBuffer_Release(&src);
+        Py_RETURN_NONE;
+    }
+
+    PyObject* dst = PyBytes_FromStringAndSize(NULL, dstlen);
+    if (!dst) {
+        PyBuffer_Release(&src);
+        return NULL;
+    }
+
+    bool success;
+    Py_BEGIN_ALLOW_THREADS
+    if (partial)
+        success = qfs_decompress_partial((const byte*)src.buf, (int)src.len, (byte*)PyBytes_AS_STRING(dst), (int)dstlen);
+    else
+        success = qfs_decompress((const byte*)src.buf, (int)src.len, (byte*)PyBytes_AS_STRING(dst), (int)dstlen);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&src);
+
+    if (!success) {
+        Py_DECREF(dst);
+        Py_RETURN_NONE;
+    }
+
+    return dst;
+}
+
+PyDoc_STRVAR(decompress_into_doc,
+"decompress_into(src, dst, size, partial=False) -> int or None\n\n"
+"Same as decompress, but writes the output into the first size bytes of the writable\n"
+"buffer dst, which allows reusing the same buffer. Returns size, or None if src is not\n"
+"valid compressed data of that size.");
+
+static PyObject* py_decompress_into(PyObject* self, PyObject* args) {
+    Py_buffer src, dst;
+    Py_ssize_t dstlen;
+    int partial = 0;
+
+    if (!PyArg_ParseTuple(args, "y*w*n|p:decompress_into", &src, &dst, &dstlen, &partial))
+        return NULL;
+
+    if (dstlen < 0 || dstlen > dst.len) {
+        PyBuffer_Release(&src);
+        PyBuffer_Release(&dst);
+        PyErr_SetString(PyExc_ValueError, "size is larger than the output buffer");
+        return NULL;
+    }
+
+    if (src.len > INT_MAX || dstlen > INT_MAX) {
+        PyBuffer_Release(&src);
+        PyBuffer_Release(&dst);
+        Py_RETURN_NONE;
+    }
+
+    bool success;
+    Py_BEGIN_ALLOW_THREADS
+    if (partial)
+        success = qfs_decompress_partial((const byte*)src.buf, (int)src.len, (byte*)dst.buf, (int)dstlen);
+    else
+        success = qfs_decompress((const byte*)src.buf, (int)src.len, (byte*)dst.buf, (int)dstlen);
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&src);
+    PyBuffer_Release(&dst);
+
+    if (!success)
+        Py_RETURN_NONE;
+
+    return PyLong_FromSsize_t(dstlen);
+}
+
+static PyMethodDef qfs_methods[] = {
+    {"compress", py_compress, METH_VARARGS, compress_doc},
+    {"decompress", py_decompress, METH_VARARGS, decompress_doc},
+    {"decompress_into", py_decompress_into, METH_VARARGS, decompress_into_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef qfs_module = {
+    PyModuleDef_HEAD_INIT,
+    "_qfs",
+    "RefPack (QFS) compression used by DBPF package files.",
+    -1,
+    qfs_methods
+};
+
+PyMODINIT_FUNC PyInit__qfs(void) {
+    return PyModule_Create(&qfs_module);
+}
@@ -0,0 +1,332 @@
+from .dbpf import named_cpf_types, named_rcol_types, named_types
+from .structio import StructView
+
+string_table_types = {0x53545223, 0x54544173, 0x43545353} #STR#, TTAs, and CTSS
+
+#read-only views of the content of entries of common types
+#the content is decompressed only as far as needed, without decompressing or changing the entry
+#the offsets of the fields are found the first time that they're needed, and the values are only decoded when they're read
+class ResourceView:
+    def __init__(self, entry):
+        self.entry = entry
+        self._data = b''
+        self._complete = False
+
+    #makes sure that the first end bytes of the content are available, raises a ValueError if the content is shorter
+    def _need(self, end):
+        if len(self._data) < end and not self._complete:
+            size = max(end, len(self._data) * 4, 1024)
+            self._data = self.entry.peek(size)
+            self._complete = len(self._data) < size
+
+        if len(self._data) < end:
+            raise ValueError('The resource is truncated')
+
+    #returns a stream of the content at position with at least size bytes available
+    def _stream(self, position, size):
+        self._need(position + size)
+        stream = StructView(self._data)
+        stream.seek(position)
+        return stream
+
+    #makes sure that the whole content is available
+    def _need_all(self):
+        while not self._complete:
+            size = max(len(self._data) * 4, 1024)
+            self._data = self.entry.peek(size)
+            self._complete = len(self._data) < size
+
+    #returns the position of the end of the null-terminated string at position
+    def _find_null(self, position):
+        while True:
+            end = self._data.find(b'\x00', position)
+
+            if end != -1:
+                return end
+
+            self._need(len(self._data) + 1)
+
+    def _read_cstr(self, position, end):
+        return self._data[position:end].decode('utf-8', errors='ignore')
+
+#resources that start with a 64 bytes file name, such as BHAV and BCON
+class NamedResource(ResourceView):
+    @property
+    def filename(self):
+        return self._stream(0, 64).read(64).split(b'\x00', 1)[0].decode('utf-8', errors='ignore')
+
+#STR#, TTAs, and CTSS resources
+#each string is a (language, value, description) tuple
+class StringTable(NamedResource):
+    def __init__(self, entry):
+        super().__init__(entry)
+        self._offsets = None
+
+    @property
+    def format(self):
+        return self._stream(64, 2).read_int(2)
+
+    def __len__(self):
+        return self._stream(66, 2).read_int(2)
+
+    def __getitem__(self, i):
+        offsets = self._get_offsets()
+
+        if i < 0:
+            i += len(offsets)
+
+        language, value_start, value_end, description_start, description_end = offsets[i]
+        return (language, self._read_cstr(value_start, value_end), self._read_cstr(description_start, description_end))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    #returns the values of the strings of a language
+    def values(self, language=1):
+        return [self._read_cstr(value_start, value_end) for string_language, value_start, value_end, description_start, description_end in self._get_offsets() if string_language == language]
+
+    def _get_offsets(self):
+        if self._offsets is None:
+            string_format = self.format
+
+            if string_format not in (0xFFFD, 0xFFFF):
+                raise ValueError('String table format 0x{:04X} not supported'.format(string_format))
+
+            offsets = []
+            position = 68
+
+            for i in range(len(self)):
+                if string_format == 0xFFFD:
+                    language = self._stream(position, 1).read_int(1)
+                    value_end = self._find_null(position + 1)
+                    description_end = self._find_null(value_end + 1)
+                    offsets.append((language, position + 1, value_end, value_end + 1, description_end))
+                    position = description_end + 1
+                else:
+                    value_end = self._find_null(position)
+                    offsets.append((1, position, value_end, value_end, value_end))
+                    position = value_end + 1
+
+            self._offsets = offsets
+
+        return self._offsets
+
+#property sets (CPF) such as GZPS and XOBJ
+#properties are indexed up to the requested property, so reading the first properties doesn't touch the rest of the content
+class PropertySet(ResourceView):
+    uint_type = 0xEB61E4F7
+    int_type = 0x0C264712
+    float_type = 0xABC78708
+    string_type = 0x0B8BEA18
+    bool_type = 0xCBA908E1
+
+    def __init__(self, entry):
+        super().__init__(entry)
+        self._offsets = {} #name -> (value type, position of the value)
+        self._names = []
+        self._position = None
+        self._count = None
+
+    @property
+    def version(self):
+        self._read_header()
+        return self._stream(4, 2).read_int(2)
+
+    def __len__(self):
+        self._read_header()
+        return self._count
+
+    def __contains__(self, name):
+        return self._find(name) is not None
+
+    def __getitem__(self, name):
+        offset = self._find(name)
+
+        if offset is None:
+            raise KeyError(name)
+
+        value_type, position = offset
+
+        if value_type == PropertySet.string_type:
+            stream = self._stream(position, 4)
+            length = stream.read_int(4)
+            return self._stream(position + 4, length).read_str(length)
+
+        elif value_type == PropertySet.bool_type:
+            return self._stream(position, 1).read_bool()
+
+        elif value_type == PropertySet.float_type:
+            return self._stream(position, 4).read_float(4)
+
+        else:
+            return self._stream(position, 4).read_int(4, signed=value_type == PropertySet.int_type)
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+
+        return default
+
+    def names(self):
+        self._find(None)
+        return list(self._names)
+
+    def items(self):
+        return [(name, self[name]) for name in self.names()]
+
+    def _read_header(self):
+        if self._count is None:
+            if self._stream(0, 5).read(5) == b'<?xml':
+                raise ValueError('XML property sets are not supported')
+
+            stream = self._stream(0, 10)
+
+            if stream.read_int(4) != 0xCBE750E0:
+                raise ValueError('Not a property set')
+
+            stream.read_int(2)
+            self._count = stream.read_int(4)
+            self._position = 10
+
+    #indexes the properties until name is found, returns its (value type, position)
+    def _find(self, name):
+        self._read_header()
+
+        if name in self._offsets:
+            return self._offsets[name]
+
+        while len(self._names) < self._count:
+            stream = self._stream(self._position, 8)
+            value_type = stream.read_int(4)
+            name_length = stream.read_int(4)
+            property_name = self._stream(self._position + 8, name_length).read_str(name_length)
+            position = self._position + 8 + name_length
+
+            if value_type == PropertySet.string_type:
+                value_size = 4 + self._stream(position, 4).read_int(4)
+            elif value_type == PropertySet.bool_type:
+                value_size = 1
+            elif value_type in (PropertySet.uint_type, PropertySet.int_type, PropertySet.float_type):
+                value_size = 4
+            else:
+                raise ValueError('Property type 0x{:08X} not supported'.format(value_type))
+
+            self._offsets.setdefault(property_name, (value_type, position))
+            self._names.append(property_name)
+            self._position = position + value_size
+
+            if property_name == name:
+                return self._offsets[name]
+
+        return None
+
+#resource collections (RCOL) such as GMDC, GMND, and TXTR
+#links are (group, instance, resource, type) tuples
+class ResourceCollection(ResourceView):
+    def __init__(self, entry):
+        super().__init__(entry)
+        self._links = None
+        self._block_types = None
+        self._blocks_position = None
+
+    @property
+    def links(self):
+        self._read_tables()
+        return list(self._links)
+
+    @property
+    def block_types(self):
+        self._read_tables()
+        return list(self._block_types)
+
+    #name of the resource, found in the cSGResource at the start of the first block
+    @property
+    def name(self):
+        self._read_tables()
+
+        start, end = self._find_7bstr(self._blocks_position) #block name
+        start, end = self._find_7bstr(end + 8) #id and version
+
+        if self._data[start:end] != b'cSGResource':
+            raise ValueError('Resource name not found')
+
+        start, end = self._find_7bstr(end + 8) #id and version
+        return self._data[start:end].decode('utf-8', errors='ignore')
+
+    #returns the start and the end of the string preceded by its length as a 7 bit integer at position
+    def _find_7bstr(self, position):
+        try:
+            self._need(position + 5) #the longest 7 bit integer
+        except ValueError:
+            pass
+
+        stream = self._stream(position, 1)
+        length = stream.read_7bint()
+        self._need(stream.tell() + length)
+        return stream.tell(), stream.tell() + length
+
+    def _read_tables(self):
+        if self._links is None:
+            stream = self._stream(0, 8)
+            version = stream.read_int(4)
+
+            if version == 0xFFFF0001:
+                count = stream.read_int(4)
+                link_size = 16
+            else:
+                count = version
+                link_size = 12
+
+            position = stream.tell()
+            stream = self._stream(position, count * link_size + 4)
+            links = []
+
+            for i in range(count):
+                if link_size == 16:
+                    links.append(tuple(stream.read_ints(4, 4)))
+                else:
+                    group_id, instance_id, type_id = stream.read_ints(4, 3)
+                    links.append((group_id, instance_id, 0, type_id))
+
+            block_count = stream.read_int(4)
+            position = stream.tell()
+            stream = self._stream(position, block_count * 4)
+
+            self._block_types = list(stream.read_ints(4, block_count))
+            self._blocks_position = stream.tell()
+            self._links = links
+
+#object definitions (OBJD), which are a file name followed by 2 bytes fields
+class ObjectDefinition(NamedResource):
+    @property
+    def guid(self):
+        return self._stream(0x5C, 4).read_int(4)
+
+    def __len__(self):
+        self._need_all()
+        return max(len(self._data) - 64, 0) // 2
+
+    #returns the 2 bytes field at index i
+    def field(self, i):
+        return self._stream(64 + i * 2, 2).read_int(2)
+
+#returns a view of the entry for its type, raises a ValueError if the type is not supported
+def view(entry):
+    if entry.type in string_table_types:
+        return StringTable(entry)
+
+    elif entry.type == 0x4F424A44:
+        return ObjectDefinition(entry)
+
+    elif entry.type in named_types:
+        return NamedResource(entry)
+
+    elif entry.type in named_cpf_types:
+        return PropertySet(entry)
+
+    elif entry.type in named_rcol_types:
+        return ResourceCollection(entry)
+
+    else:
+        raise ValueError('Type 0x{:08X} not supported'.format(entry.type))
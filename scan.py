@@ -0,0 +1,144 @@
+from .dbpf import CompactIndex, _read_header
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sqlite3
+import struct
+
+#reads the header and the index of many packages without reading their entries
+#the results are kept in an SQLite database, so only new and modified files are read again when rescanning
+class Scanner:
+    def __init__(self, cache_path=':memory:'):
+        self.cache_path = cache_path
+        self.connection = sqlite3.connect(cache_path)
+
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime INTEGER);
+            CREATE TABLE IF NOT EXISTS entries (file_id INTEGER, type_id INTEGER, group_id INTEGER, instance_id INTEGER, resource_id INTEGER, location INTEGER, size INTEGER);
+            CREATE INDEX IF NOT EXISTS entries_file ON entries (file_id);
+            CREATE INDEX IF NOT EXISTS entries_tgir ON entries (type_id, group_id, instance_id, resource_id);
+        ''')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    #paths can be package files or folders, folders are searched recursively for package files
+    #returns a list of the files that were read and a list of the files that could not be read
+    def scan(self, paths, workers=8):
+        if isinstance(paths, str):
+            paths = [paths]
+
+        files = {}
+        folders = []
+
+        for path in paths:
+            path = os.path.abspath(path)
+
+            if os.path.isdir(path):
+                folders.append(path)
+
+                for root, dirs, names in os.walk(path):
+                    for name in names:
+                        if name.lower().endswith('.package'):
+                            file_path = os.path.join(root, name)
+                            files[file_path] = os.stat(file_path)
+            else:
+                files[path] = os.stat(path)
+
+        cached = {path: (file_id, size, mtime) for file_id, path, size, mtime in self.connection.execute('SELECT id, path, size, mtime FROM files')}
+
+        #forget files that were deleted from the scanned folders
+        for path, (file_id, size, mtime) in cached.items():
+            if path not in files and any(path.startswith(os.path.join(folder, '')) for folder in folders):
+                self._delete(file_id)
+
+        changed = [path for path, stat in files.items() if cached.get(path, (None, None, None))[1:] != (stat.st_size, stat.st_mtime_ns)]
+
+        with ThreadPoolExecutor(workers) as executor:
+            results = list(executor.map(_scan_file, changed))
+
+        updated = []
+        failed = []
+
+        for path, records in zip(changed, results):
+            if path in cached:
+                self._delete(cached[path][0])
+
+            if records is None:
+                failed.append(path)
+                continue
+
+            stat = files[path]
+            file_id = self.connection.execute('INSERT INTO files (path, size, mtime) VALUES (?, ?, ?)', (path, stat.st_size, stat.st_mtime_ns)).lastrowid
+            self.connection.executemany('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)', ((file_id,) + tuple(record) for record in records))
+            updated.append(path)
+
+        self.connection.commit()
+        return updated, failed
+
+    def _delete(self, file_id):
+        self.connection.execute('DELETE FROM entries WHERE file_id = ?', (file_id,))
+        self.connection.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    #returns a list of the paths of the scanned files
+    def files(self):
+        return [path for path, in self.connection.execute('SELECT path FROM files ORDER BY path')]
+
+    #returns a list of (type, group, instance, resource, location, size) tuples for a scanned file
+    def entries(self, path):
+        query = 'SELECT type_id, group_id, instance_id, resource_id, entries.location, entries.size FROM entries JOIN files ON files.id = file_id WHERE path = ?'
+        return self.connection.execute(query, (os.path.abspath(path),)).fetchall()
+
+    #returns a list of the paths of the files containing an entry matching the criteria, ignores arguments set equal to -1
+    def find(self, type_id=-1, group_id=-1, instance_id=-1, resource_id=-1):
+        conditions = []
+        values = []
+
+        for column, value in (('type_id', type_id), ('group_id', group_id), ('instance_id', instance_id), ('resource_id', resource_id)):
+            if value != -1:
+                conditions.append('{} = ?'.format(column))
+                values.append(value)
+
+        query = 'SELECT DISTINCT path FROM entries JOIN files ON files.id = file_id'
+
+        if len(conditions) > 0:
+            query += ' WHERE ' + ' AND '.join(conditions)
+
+        return [path for path, in self.connection.execute(query + ' ORDER BY path', values)]
+
+    #returns a dictionary mapping each (type, group, instance, resource) found in more than one file to the list of these files
+    #the files are sorted by path
+    def conflicts(self):
+        query = '''
+            SELECT type_id, group_id, instance_id, resource_id, path FROM entries JOIN files ON files.id = file_id
+            WHERE type_id != ? AND (type_id, group_id, instance_id, resource_id) IN (
+                SELECT type_id, group_id, instance_id, resource_id FROM entries
+                GROUP BY type_id, group_id, instance_id, resource_id HAVING COUNT(DISTINCT file_id) > 1)
+            ORDER BY type_id, group_id, instance_id, resource_id, path
+        '''
+
+        conflicts = {}
+        for type_id, group_id, instance_id, resource_id, path in self.connection.execute(query, (0xE86B1EEF,)):
+            paths = conflicts.setdefault((type_id, group_id, instance_id, resource_id), [])
+            if len(paths) == 0 or paths[-1] != path:
+                paths.append(path)
+
+        return conflicts
+
+def _scan_file(path):
+    try:
+        with open(path, 'rb') as file:
+            if file.read(4) != b'DBPF':
+                return None
+
+            file.seek(0)
+            index = CompactIndex.read(file, _read_header(file))
+            return list(zip(index.types, index.groups, index.instances, index.resources, index.locations, index.sizes))
+
+    except (OSError, ValueError, struct.error):
+        return None
@@ -1,5 +1,9 @@
+from array import array
+import functools
 import io
+import re
 import struct
+import sys
 
 _endians = {'big': '>', 'little': '<'}
 _unsigned_int_formats = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
@@ -27,6 +31,28 @@ def _get_float_format(size, n, endian):
 
     return _endians[endian] + str(n) +  _float_formats[size]
 
+#compiled Struct objects are cached so that the formats are only parsed once
+@functools.lru_cache(maxsize=256)
+def _get_int_struct(size, n, endian, signed):
+    return struct.Struct(_get_int_format(size, n, endian, signed))
+
+@functools.lru_cache(maxsize=256)
+def _get_float_struct(size, n, endian):
+    return struct.Struct(_get_float_format(size, n, endian))
+
+#the size of array items depends on the platform, lowercase typecodes are signed
+_array_typecodes = {1: ('b', 'B'), 2: ('h', 'H'), 4: ('i', 'I', 'l', 'L'), 8: ('q', 'Q')}
+
+def _get_array_typecode(size, signed):
+    if size not in _array_typecodes:
+        raise ValueError("integer size '{}' not supported".format(size))
+
+    for typecode in _array_typecodes[size]:
+        if typecode.islower() == signed and array(typecode).itemsize == size:
+            return typecode
+
+    raise ValueError("integer size '{}' not supported by array".format(size))
+
 class StructIO(io.BytesIO):
     def __init__(self, b=b'', endian='little', encoding='utf-8', errors='ignore'):
         super().__init__(b)
@@ -38,12 +64,10 @@ class StructIO(io.BytesIO):
     def buffer(self):
         return self.getvalue()
 
+    #reinitializing shares bytes objects instead of copying them
     @buffer.setter
     def buffer(self, b):
-        self.seek(0)
-        self.write(b)
-        self.truncate()
-        self.seek(0)
+        super().__init__(b)
 
     def __len__(self):
         position = self.tell()
@@ -96,22 +120,54 @@ class StructIO(io.BytesIO):
         return self.write(number.to_bytes(size, self._get_endian(endian), signed=signed))
 
     def read_ints(self, size, n, endian=None, signed=False):
-        return struct.unpack(_get_int_format(size, n, self._get_endian(endian), signed), self.read(size * n))
+        return _get_int_struct(size, n, self._get_endian(endian), signed).unpack(self.read(size * n))
 
     def write_ints(self, numbers, size, endian=None, signed=False):
-        return self.write(struct.pack(_get_int_format(size, len(numbers), self._get_endian(endian), signed), *numbers))
+        return self.write(_get_int_struct(size, len(numbers), self._get_endian(endian), signed).pack(*numbers))
+
+    #reads n integers into an array in a single pass
+    def read_array(self, size, n, endian=None, signed=False):
+        numbers = array(_get_array_typecode(size, signed))
+        data = self.read(size * n)
+
+        if len(data) < size * n:
+            raise ValueError('expected {} bytes, got {}'.format(size * n, len(data)))
+
+        numbers.frombytes(data)
+
+        if self._get_endian(endian) != sys.byteorder:
+            numbers.byteswap()
+
+        return numbers
+
+    #same as read_array, but returns a NumPy array (requires NumPy)
+    def read_ndarray(self, size, n, endian=None, signed=False):
+        import numpy
+
+        if signed:
+            kind = 'i'
+        else:
+            kind = 'u'
+
+        dtype = numpy.dtype(_endians[self._get_endian(endian)] + kind + str(size))
+        return numpy.frombuffer(self.read(size * n), dtype, n)
+
+    #reads count records of n integers each, returns an iterator of tuples
+    def iter_records(self, size, n, count, endian=None, signed=False):
+        record = _get_int_struct(size, n, self._get_endian(endian), signed)
+        return record.iter_unpack(self.read(record.size * count))
 
     def read_float(self, size, endian=None):
-        return struct.unpack(_get_float_format(size, 1, self._get_endian(endian)), self.read(size))[0]
+        return _get_float_struct(size, 1, self._get_endian(endian)).unpack(self.read(size))[0]
 
     def write_float(self, number, size, endian=None):
-        return self.write(struct.pack(_get_float_format(size, 1, self._get_endian(endian)), number))
+        return self.write(_get_float_struct(size, 1, self._get_endian(endian)).pack(number))
 
     def read_floats(self, size, n, endian=None):
-        return struct.unpack(_get_float_format(size, n, self._get_endian(endian)), self.read(size * n))
+        return _get_float_struct(size, n, self._get_endian(endian)).unpack(self.read(size * n))
 
     def write_floats(self, numbers, size, endian=None):
-        return self.write(struct.pack(_get_float_format(size, len(numbers), self._get_endian(endian)), *numbers))
+        return self.write(_get_float_struct(size, len(numbers), self._get_endian(endian)).pack(*numbers))
 
     def read_str(self, length):
         return self.read(length).decode(self.encoding, errors=self.errors)
@@ -181,4 +237,152 @@ class StructIO(io.BytesIO):
         while self.read(1)[0] > 127:
             pass
 
-        return self.tell()
\ No newline at end of file
+        return self.tell()
+
+#a read-only StructIO over a bytes, bytearray, mmap, or memoryview object that doesn't copy it
+#reads only copy the bytes that are read, and searches run directly over the object
+class StructView(StructIO):
+    def __init__(self, b=b'', start=0, end=None, endian='little', encoding='utf-8', errors='ignore'):
+        super().__init__(b'', endian, encoding, errors)
+
+        view = memoryview(b).cast('B')
+
+        if end is None:
+            end = len(view)
+
+        self._object = b
+        self._view = view[start:end]
+        self._start = start
+        self._position = 0
+
+    @property
+    def buffer(self):
+        return self.getvalue()
+
+    @buffer.setter
+    def buffer(self, b):
+        raise io.UnsupportedOperation('StructView is read-only')
+
+    def __len__(self):
+        return len(self._view)
+
+    def getvalue(self):
+        return bytes(self._view)
+
+    def getbuffer(self):
+        return self._view.toreadonly()
+
+    def copy(self):
+        return StructIO(self.getvalue(), self.endian, self.encoding, self.errors)
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def seekable(self):
+        return True
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self._position
+        elif whence == 2:
+            pos += len(self._view)
+        elif whence != 0:
+            raise ValueError("invalid whence ({}, should be 0, 1 or 2)".format(whence))
+
+        if pos < 0:
+            raise ValueError('negative seek value {}'.format(pos))
+
+        self._position = pos
+        return pos
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            end = len(self._view)
+        else:
+            end = min(self._position + size, len(self._view))
+
+        b = bytes(self._view[self._position:end])
+        self._position = max(self._position, end)
+        return b
+
+    def read1(self, size=-1):
+        return self.read(size)
+
+    def readinto(self, b):
+        b = memoryview(b).cast('B')
+        data = self._view[self._position:self._position + len(b)]
+        b[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def readline(self, size=-1):
+        end = self.find(b'\n')
+
+        if end == -1:
+            return self.read(size)
+
+        if size is None or size < 0:
+            size = end + 1 - self._position
+
+        return self.read(min(size, end + 1 - self._position))
+
+    def readlines(self, hint=-1):
+        lines = []
+        length = 0
+
+        for line in self:
+            lines.append(line)
+            length += len(line)
+
+            if hint is not None and 0 < hint <= length:
+                break
+
+        return lines
+
+    def __next__(self):
+        line = self.readline()
+
+        if line == b'':
+            raise StopIteration
+
+        return line
+
+    def write(self, b):
+        raise io.UnsupportedOperation('StructView is read-only')
+
+    def writelines(self, lines):
+        raise io.UnsupportedOperation('StructView is read-only')
+
+    def truncate(self, size=None):
+        raise io.UnsupportedOperation('StructView is read-only')
+
+    def find(self, b):
+        #bytes, bytearray, and mmap objects can be searched without making a copy
+        if hasattr(self._object, 'find'):
+            location = self._object.find(b, self._start + self._position, self._start + len(self._view))
+
+            if location == -1:
+                return -1
+
+            return location - self._start
+
+        match = re.compile(re.escape(b)).search(self._view, self._position)
+
+        if match is None:
+            return -1
+
+        return match.start()
+
+    def index(self, b):
+        location = self.find(b)
+
+        if location == -1:
+            raise ValueError('subsection not found')
+
+        return location